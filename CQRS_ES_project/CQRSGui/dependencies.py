@@ -1,30 +1,33 @@
-from SimpleCQRS.fake_bus import FakeBus
-from SimpleCQRS.event_store import EventStore
-from SimpleCQRS.domain import Repository, InventoryItem
-from SimpleCQRS.command_handlers import InventoryCommandHandlers
+from SimpleCQRS.async_bus import AsyncBus
+from SimpleCQRS.event_store import EventStore, AsyncEventStore
+from SimpleCQRS.domain import Repository, AsyncRepository, AsyncCachingRepository, InventoryItem
+from SimpleCQRS.command_handlers import AsyncInventoryCommandHandlers, RetryPolicy
+from SimpleCQRS.outbox import OutboxPublisher
+from SimpleCQRS.scheduler import CommandScheduler
 from SimpleCQRS.real_model import InventoryListView, InventoryItemDetailView
 from .service_locator import ServiceLocator
 from SimpleCQRS.commands import (CreateInventoryItem,ChangeMaxQty,CheckInItemsToInventory,DeactivateInventoryItem,RemoveItemsFromInventory,RenameInventoryItem)
-from SimpleCQRS.events import (InventoryItemCreated,InventoryItemDeactivated,InventoryItemRenamed,ItemsCheckedInToInventory,ItemsRemovedFromInventory,MaxQtyChanged)
+from SimpleCQRS.events import (Event,InventoryItemCreated,InventoryItemDeactivated,InventoryItemRenamed)
 
-bus = FakeBus()
+bus = AsyncBus()
 
-storage = EventStore(bus)
+outbox = OutboxPublisher(bus)
 
-rep = Repository[InventoryItem](storage, InventoryItem)
+storage = EventStore(outbox)
 
-commands_handler = InventoryCommandHandlers(rep)
+async_storage = AsyncEventStore(storage)
+
+rep = AsyncCachingRepository[InventoryItem](AsyncRepository[InventoryItem](async_storage, InventoryItem), async_storage)
+
+commands_handler = AsyncInventoryCommandHandlers(rep, RetryPolicy())
+
+scheduler = CommandScheduler(commands_handler)
 
 detail = InventoryItemDetailView()
-bus.register_handler(InventoryItemCreated,detail.handle)
-bus.register_handler(InventoryItemDeactivated,detail.handle)
-bus.register_handler(InventoryItemRenamed,detail.handle)
-bus.register_handler(ItemsCheckedInToInventory,detail.handle)
-bus.register_handler(ItemsRemovedFromInventory,detail.handle)
-bus.register_handler(MaxQtyChanged,detail.handle)
+bus.register_batch_handler(Event,detail.handle_many)
 lst = InventoryListView()
-bus.register_handler(InventoryItemCreated,lst.handle)
-bus.register_handler(InventoryItemDeactivated,lst.handle)
-bus.register_handler(InventoryItemRenamed,lst.handle)
+bus.register_batch_handler(InventoryItemCreated,lst.handle_many)
+bus.register_batch_handler(InventoryItemDeactivated,lst.handle_many)
+bus.register_batch_handler(InventoryItemRenamed,lst.handle_many)
 
 ServiceLocator.bus = bus
\ No newline at end of file
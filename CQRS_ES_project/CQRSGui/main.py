@@ -1,10 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from .routers import home
+from .dependencies import scheduler, commands_handler, bus, outbox
+from SimpleCQRS.scheduler import SchedulerStats
+from SimpleCQRS.command_handlers import RetryStats
+from SimpleCQRS.metrics import default_registry
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, PlainTextResponse
 from traceback import print_exception
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app : FastAPI):
+    await bus.start()
+    scheduler.start()
+    yield
+    await scheduler.close()
+    # the outbox dispatcher hands events to the bus on this loop, so it is flushed off-loop
+    await asyncio.to_thread(outbox.flush)
+    await bus.close()
 
-app.include_router(home.router)
\ No newline at end of file
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(home.router)
+
+# state that already has a cheap reading is sampled when /metrics is scraped instead of on every change
+default_registry.gauge("cqrs_scheduler_queue_depth", "Commands waiting in scheduler mailboxes.", function=lambda: scheduler.stats.queue_depth)
+default_registry.gauge("cqrs_scheduler_busy_workers", "Scheduler workers handling a mailbox.", function=lambda: scheduler.stats.busy_workers)
+default_registry.gauge("cqrs_scheduler_utilization_ratio", "Share of scheduler worker time spent handling commands.", function=lambda: scheduler.stats.utilization)
+default_registry.gauge("cqrs_outbox_pending_events", "Committed events not yet delivered to the bus.", function=lambda: outbox.stats.pending)
+default_registry.counter("cqrs_outbox_failed_total", "Events the outbox gave up delivering.", function=lambda: outbox.stats.failed)
+default_registry.gauge("cqrs_outbox_parked_aggregates", "Aggregates whose events are held back after a failed delivery.", function=lambda: outbox.stats.parked)
+default_registry.gauge("cqrs_bus_pending_events", "Events queued or being handled by the bus.", function=lambda: bus.pending)
+default_registry.counter("cqrs_command_conflicts_total", "Concurrency conflicts seen by retried commands.", function=lambda: commands_handler.retry_policy.stats(0).conflicts)
+default_registry.counter("cqrs_command_retries_total", "Command retries after a concurrency conflict.", function=lambda: commands_handler.retry_policy.stats(0).retries)
+default_registry.counter("cqrs_command_retries_exhausted_total", "Commands that conflicted on every attempt.", function=lambda: commands_handler.retry_policy.stats(0).exhausted)
+
+@app.get("/scheduler")
+async def scheduler_stats() -> SchedulerStats:
+    return scheduler.stats
+
+@app.get("/retries")
+async def retry_stats() -> RetryStats:
+    return commands_handler.retry_policy.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    return PlainTextResponse(default_registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,4 @@
-from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.async_bus import AsyncBus
 
 class ServiceLocator:
-    bus : FakeBus
\ No newline at end of file
+    bus : AsyncBus
\ No newline at end of file
@@ -0,0 +1,260 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+from functools import partial
+from typing import Any, Awaitable, Callable, Sequence, Type
+from .events import Event
+from .fake_bus import DeliveryFailure, ICommandSender, IEventPublisher, RoutingTable, M, E, C
+from .exceptions import BatchError, DeliveryError, InvalidOperationError
+from .metrics import event_handler_failures, handler_name, projection_lag
+
+Handler = Callable[[Any], None | Awaitable[None]]
+
+class _Receipt:
+    """The events of one publish from another thread, reported back once every one of them was handled."""
+    __slots__ = ("remaining", "failures", "done")
+
+    def __init__(self, count : int) -> None:
+        self.remaining = count
+        self.failures : list[DeliveryFailure] = []
+        self.done = asyncio.Event()
+
+class _Shard:
+    def __init__(self) -> None:
+        self.events : deque[tuple[Event, float, _Receipt | None]] = deque()
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+
+class AsyncBus(ICommandSender, IEventPublisher):
+    """asyncio bus for sync or coroutine handlers.
+
+    Events are hashed by aggregate id onto ``workers`` shards, each drained by one task, so events of
+    one aggregate are handled in publish order while different aggregates are handled concurrently.
+    A shard holding ``max_pending`` events makes ``publish_async`` wait, and makes ``publish`` called
+    from another thread (such as a store running on an executor) block, until the projections catch up.
+    A worker takes everything queued on its shard at once and hands batch handlers their share in one call.
+
+    A handler that fails on an event holds back the later events of that aggregate, the other handlers
+    carry on, and the events it missed are counted in ``cqrs_event_handler_failures_total``. A publish from
+    another thread also waits until its events were handled and raises a ``DeliveryError`` for what was
+    missed, so an outbox can redeliver exactly that.
+    """
+
+    def __init__(self, workers : int = 4, max_pending : int = 1000) -> None:
+        self.__routes : RoutingTable[Handler] = RoutingTable()
+        self.__batch_routes : RoutingTable[Callable[[Sequence[Any]], None | Awaitable[None]]] = RoutingTable("batch")
+        self.__worker_count = workers
+        self.__max_pending = max_pending
+        self.__loop : asyncio.AbstractEventLoop | None = None
+        self.__shards : list[_Shard] = []
+        self.__workers : list[asyncio.Task[None]] = []
+        self.__in_flight = 0
+        self.__idle : asyncio.Event | None = None
+        self.__sending : set[asyncio.Task[None]] = set()
+
+    def register_handler(self, typename : Type[M], handler : Callable[[M], None | Awaitable[None]]) -> None:
+        self.__routes.add(typename, handler)
+
+    def register_batch_handler(self, typename : Type[M], handler : Callable[[Sequence[M]], None | Awaitable[None]]) -> None:
+        self.__batch_routes.add(typename, handler)
+
+    async def start(self) -> None:
+        self.__loop = asyncio.get_running_loop()
+        self.__shards = [_Shard() for _ in range(self.__worker_count)]
+        self.__idle = asyncio.Event()
+        self.__idle.set()
+        self.__workers = [self.__loop.create_task(self.__work(shard)) for shard in self.__shards]
+
+    @property
+    def pending(self) -> int:
+        return self.__in_flight
+
+    async def drain(self) -> None:
+        if self.__idle is not None:
+            await self.__idle.wait()
+
+    async def close(self) -> None:
+        await asyncio.gather(*self.__sending, return_exceptions=True)
+        await self.drain()
+        for worker in self.__workers:
+            worker.cancel()
+        await asyncio.gather(*self.__workers, return_exceptions=True)
+        self.__workers = []
+        self.__loop = None
+
+    def __in_loop(self) -> bool:
+        if self.__loop is None:
+            raise InvalidOperationError("bus is not started")
+        try:
+            return asyncio.get_running_loop() is self.__loop
+        except RuntimeError:
+            return False
+
+    def __enqueue(self, event : E, receipt : _Receipt | None = None) -> None:
+        shard = self.__shards[hash(getattr(event, "id", None)) % len(self.__shards)]
+        shard.events.append((event, time.perf_counter(), receipt))
+        shard.not_empty.set()
+        if len(shard.events) >= self.__max_pending:
+            shard.not_full.clear()
+        self.__in_flight += 1
+        self.__idle.clear()
+
+    async def __put(self, event : E, receipt : _Receipt | None = None) -> None:
+        if self.__loop is None:
+            raise InvalidOperationError("bus is not started")
+        shard = self.__shards[hash(getattr(event, "id", None)) % len(self.__shards)]
+        await shard.not_full.wait()
+        self.__enqueue(event, receipt)
+
+    async def publish_async(self, event : E) -> None:
+        await self.__put(event)
+
+    def publish(self, event : E) -> None:
+        if self.__in_loop():
+            # the loop thread cannot wait on itself, so this path queues past the limit
+            self.__enqueue(event)
+        else:
+            self.publish_many((event,))
+
+    async def publish_many_async(self, events : Sequence[E]) -> None:
+        for event in events:
+            await self.__put(event)
+
+    async def __publish_and_wait(self, events : Sequence[E]) -> None:
+        receipt = _Receipt(len(events))
+        for event in events:
+            await self.__put(event, receipt)
+        if events:
+            await receipt.done.wait()
+        if receipt.failures:
+            raise DeliveryError(receipt.failures)
+
+    def publish_many(self, events : Sequence[E]) -> None:
+        if self.__in_loop():
+            for event in events:
+                self.__enqueue(event)
+        else:
+            # one hop onto the loop for the whole commit instead of one per event
+            asyncio.run_coroutine_threadsafe(self.__publish_and_wait(events), self.__loop).result()
+
+    async def send_async(self, command : C) -> None:
+        handlers = self.__routes.get(type(command))
+        if not handlers:
+            raise InvalidOperationError("no handler registered")
+        if len(handlers) != 1:
+            raise InvalidOperationError("cannot send to more than one handler")
+        result = handlers[0][0](command)
+        if inspect.isawaitable(result):
+            await result
+
+    def send(self, command : C) -> None:
+        if self.__in_loop():
+            # the loop only keeps a weak reference to a task, so the bus holds on to it until it is done
+            task = self.__loop.create_task(self.send_async(command))
+            self.__sending.add(task)
+            task.add_done_callback(self.__sent)
+        else:
+            asyncio.run_coroutine_threadsafe(self.send_async(command), self.__loop).result()
+
+    def __sent(self, task : asyncio.Task[None]) -> None:
+        self.__sending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(task.exception())
+
+    async def __work(self, shard : _Shard) -> None:
+        while True:
+            while not shard.events:
+                shard.not_empty.clear()
+                await shard.not_empty.wait()
+            # everything queued on the shard is taken at once, so batch handlers see it in one call
+            batch = list(shard.events)
+            shard.events.clear()
+            shard.not_full.set()
+            try:
+                await self.__handle(batch)
+            finally:
+                lag = projection_lag.labels("bus")
+                now = time.perf_counter()
+                for _, enqueued_at, receipt in batch:
+                    lag.observe(now - enqueued_at)
+                    if receipt is not None:
+                        receipt.remaining -= 1
+                        if not receipt.remaining:
+                            receipt.done.set()
+                self.__in_flight -= len(batch)
+                if not self.__in_flight:
+                    self.__idle.set()
+
+    async def __handle(self, batch : list[tuple[Event, float, _Receipt | None]]) -> None:
+        events = [event for event, _, _ in batch]
+        deliveries = [(self.__deliver_each, handler, timer, messages) for handler, timer, messages in self.__routes.group(events)]
+        deliveries += [(self.__deliver_batch, handler, timer, messages) for handler, timer, messages in self.__batch_routes.group(events)]
+        # handlers run concurrently, each over its own share of the batch in publish order
+        results = await asyncio.gather(*(deliver(handler, timer, messages) for deliver, handler, timer, messages in deliveries))
+        receipts : dict[int, _Receipt | None] | None = None
+        for (deliver, handler, timer, _), result in zip(deliveries, results):
+            if result is None:
+                continue
+            failed, error = result
+            print(error)
+            name = handler_name(handler)
+            for event in failed:
+                event_handler_failures.labels(type(event).__name__, name).inc()
+            if receipts is None:
+                receipts = {id(event): receipt for event, _, receipt in batch}
+            shares : dict[int, tuple[_Receipt, list[Any]]] = {}
+            for event in failed:
+                receipt = receipts[id(event)]
+                if receipt is not None:
+                    shares.setdefault(id(receipt), (receipt, []))[1].append(event)
+            for receipt, share in shares.values():
+                receipt.failures.append(DeliveryFailure(handler, share, error, partial(self.__redeliver, deliver, handler, timer, share)))
+
+    def __redeliver(self, deliver : Callable[..., Awaitable[tuple[list[Any], Exception] | None]], handler : Callable[..., Any], timer : Any, events : list[Any]) -> None:
+        if self.__in_loop():
+            raise InvalidOperationError("redeliver from another thread than the bus loop")
+        result = asyncio.run_coroutine_threadsafe(deliver(handler, timer, events), self.__loop).result()
+        if result is not None:
+            failed, error = result
+            raise DeliveryError([DeliveryFailure(handler, failed, error, partial(self.__redeliver, deliver, handler, timer, failed))])
+
+    @staticmethod
+    async def __deliver_each(handler : Handler, timer : Any, events : list[Any]) -> tuple[list[Any], Exception] | None:
+        failed : list[Any] = []
+        error : Exception | None = None
+        held : set[Any] = set()
+        for event in events:
+            aggregate = getattr(event, "id", None)
+            if aggregate in held:
+                failed.append(event)
+                continue
+            started = time.perf_counter()
+            try:
+                result = handler(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                error = error or e
+                held.add(aggregate)
+                failed.append(event)
+            finally:
+                timer.observe(time.perf_counter() - started)
+        return (failed, error) if failed else None
+
+    @staticmethod
+    async def __deliver_batch(handler : Callable[[Sequence[Any]], None | Awaitable[None]], timer : Any, events : list[Any]) -> tuple[list[Any], Exception] | None:
+        started = time.perf_counter()
+        try:
+            result = handler(events)
+            if inspect.isawaitable(result):
+                await result
+            return None
+        except BatchError as e:
+            return [message for message, _ in e.failed], e.failed[0][1]
+        except Exception as e:
+            # nothing tells which events the handler applied before it raised, so it gets all of them again
+            return events, e
+        finally:
+            timer.observe(time.perf_counter() - started)
@@ -0,0 +1,126 @@
+import struct
+from typing import Any, Sequence, Type
+from .message import Message
+from .events import (Event, InventoryItemCreated, InventoryItemDeactivated, InventoryItemRenamed, ItemsCheckedInToInventory, ItemsRemovedFromInventory, MaxQtyChanged)
+from .commands import (ChangeMaxQty, CheckInItemsToInventory, CreateInventoryItem, DeactivateInventoryItem, RemoveItemsFromInventory, RenameInventoryItem)
+from .guid import Guid
+from .exceptions import InvalidOperationError
+
+# record layout: tag (u8), version (i64), then the fixed-size fields in declaration order with a
+# u32 byte length standing in for every str field, then the utf-8 bytes of the str fields
+_FIELD_FORMATS : dict[Any, str] = {Guid : "16s", str : "I", int : "q", bool : "?"}
+# a batch is a run of records, each preceded by its u32 byte length
+_RECORD_LENGTH = struct.Struct("<I")
+
+def _encode_guid(value : Guid) -> bytes:
+    raw = bytes.fromhex(value.replace("-", ""))
+    if len(raw) != 16:
+        raise ValueError(f"not a guid: {value!r}")
+    return raw
+
+def _decode_guid(raw : bytes) -> Guid:
+    h = raw.hex()
+    return Guid(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+
+class _MessageSpec:
+    __slots__ = ("tag", "message_type", "fields", "kinds", "layout", "versioned")
+
+    def __init__(self, tag : int, message_type : Type[Message], fields : Sequence[tuple[str, Any]]) -> None:
+        self.tag = tag
+        self.message_type = message_type
+        self.fields = tuple(name for name, _ in fields)
+        self.kinds = tuple(kind for _, kind in fields)
+        self.layout = struct.Struct("<Bq" + "".join(_FIELD_FORMATS[kind] for kind in self.kinds))
+        self.versioned = issubclass(message_type, Event)
+
+class MessageCodec:
+
+    def __init__(self) -> None:
+        self.__by_type : dict[type, _MessageSpec] = {}
+        self.__by_tag : dict[int, _MessageSpec] = {}
+
+    def register(self, tag : int, message_type : Type[Message], fields : Sequence[tuple[str, Any]]) -> None:
+        if not 0 <= tag <= 255:
+            raise InvalidOperationError(f"tag {tag} does not fit in one byte")
+        if tag in self.__by_tag or message_type in self.__by_type:
+            raise InvalidOperationError(f"{message_type.__name__} or tag {tag} is already registered")
+        for _, kind in fields:
+            if kind not in _FIELD_FORMATS:
+                raise InvalidOperationError(f"unsupported field type {kind!r}")
+        spec = _MessageSpec(tag, message_type, fields)
+        self.__by_type[message_type] = spec
+        self.__by_tag[tag] = spec
+
+    def tag_of(self, message_type : Type[Message]) -> int:
+        return self.__by_type[message_type].tag
+
+    def type_of(self, tag : int) -> Type[Message]:
+        return self.__by_tag[tag].message_type
+
+    def encode(self, message : Message) -> bytes:
+        spec = self.__by_type.get(type(message))
+        if spec is None:
+            raise InvalidOperationError(f"{type(message).__name__} is not registered")
+        values : list[Any] = [spec.tag, getattr(message, "version", -1)]
+        tail = b""
+        for name, kind in zip(spec.fields, spec.kinds):
+            value = getattr(message, name)
+            if kind is str:
+                value = value.encode()
+                tail += value
+                values.append(len(value))
+            elif kind is Guid:
+                values.append(_encode_guid(value))
+            else:
+                values.append(value)
+        return spec.layout.pack(*values) + tail
+
+    def decode(self, data : bytes) -> Message:
+        spec = self.__by_tag.get(data[0])
+        if spec is None:
+            raise InvalidOperationError(f"unknown message tag {data[0]}")
+        _, version, *values = spec.layout.unpack_from(data)
+        pos = spec.layout.size
+        for i, kind in enumerate(spec.kinds):
+            if kind is str:
+                end = pos + values[i]
+                values[i] = str(data[pos:end], "utf-8")
+                pos = end
+            elif kind is Guid:
+                values[i] = _decode_guid(values[i])
+        message = spec.message_type(*values)
+        if spec.versioned:
+            message.version = version
+        return message
+
+    def encode_batch(self, messages : Sequence[Message]) -> bytes:
+        parts = []
+        for message in messages:
+            record = self.encode(message)
+            parts.append(_RECORD_LENGTH.pack(len(record)))
+            parts.append(record)
+        return b"".join(parts)
+
+    def decode_batch(self, data : bytes) -> list[Message]:
+        messages = []
+        pos = 0
+        while pos < len(data):
+            (length,) = _RECORD_LENGTH.unpack_from(data, pos)
+            pos += _RECORD_LENGTH.size
+            messages.append(self.decode(data[pos:pos + length]))
+            pos += length
+        return messages
+
+default_codec = MessageCodec()
+default_codec.register(1, InventoryItemCreated, [("id", Guid), ("name", str), ("max_qty", int)])
+default_codec.register(2, InventoryItemDeactivated, [("id", Guid)])
+default_codec.register(3, InventoryItemRenamed, [("id", Guid), ("new_name", str)])
+default_codec.register(4, ItemsCheckedInToInventory, [("id", Guid), ("count", int)])
+default_codec.register(5, ItemsRemovedFromInventory, [("id", Guid), ("count", int)])
+default_codec.register(6, MaxQtyChanged, [("id", Guid), ("new_max_qty", int)])
+default_codec.register(101, CreateInventoryItem, [("inventory_item_id", Guid), ("name", str)])
+default_codec.register(102, DeactivateInventoryItem, [("inventory_item_id", Guid), ("original_version", int)])
+default_codec.register(103, RenameInventoryItem, [("inventory_item_id", Guid), ("new_name", str), ("original_version", int)])
+default_codec.register(104, CheckInItemsToInventory, [("inventory_item_id", Guid), ("count", int), ("original_version", int)])
+default_codec.register(105, RemoveItemsFromInventory, [("inventory_item_id", Guid), ("count", int), ("original_version", int)])
+default_codec.register(106, ChangeMaxQty, [("inventory_item_id", Guid), ("new_max_qty", int), ("original_version", int)])
@@ -1,52 +1,273 @@
-from .domain import IRepository, InventoryItem
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Generator, Sequence, TypeVar
+from .domain import IAsyncRepository, IRepository, InventoryItem
 from .commands import (CheckInItemsToInventory,ChangeMaxQty,RemoveItemsFromInventory,RenameInventoryItem,CreateInventoryItem,DeactivateInventoryItem, Command)
-from multipledispatch import dispatch
-from .exceptions import GenericError
+from .dispatch import dispatch
+from .exceptions import GenericError, AggregateNotFoundError, ConcurrencyError
+from .guid import Guid
+from .metrics import default_registry
 
+_command_duration = default_registry.histogram("cqrs_command_duration_seconds", "Time to handle one command, retries included.", ("command",))
+_command_errors = default_registry.counter("cqrs_command_errors_total", "Commands rejected with an error.", ("command", "error"))
+
+# what the domain rejects a single command with; a batch reports these per command and carries on
+_REJECTIONS = (GenericError, ValueError)
+
+@dataclass(frozen=True)
+class RetryStats:
+    conflicts : int
+    retries : int
+    resolved : int
+    exhausted : int
+    hot_items : list[tuple[Guid, int]]
+
+class RetryPolicy:
+    """Server-side retry for commands that commute with concurrent writes: on a ConcurrencyError the
+    aggregate is reloaded and the command re-run against its latest version, so the domain checks see
+    the new state, with capped exponential backoff and jitter between attempts."""
+
+    def __init__(self, max_attempts : int = 3, base_delay : float = 0.002, max_delay : float = 0.05,
+                 commands : tuple[type["Command"], ...] = (CheckInItemsToInventory, RemoveItemsFromInventory)) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.commands = commands
+        self.__lock = threading.Lock()
+        self.__conflicts : Counter[Guid] = Counter()
+        self.__retries = 0
+        self.__resolved = 0
+        self.__exhausted = 0
+
+    def applies_to(self, message : "Command") -> bool:
+        return isinstance(message, self.commands)
+
+    def backoff(self, attempt : int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def record_conflict(self, message : "Command") -> None:
+        with self.__lock:
+            self.__conflicts[message.inventory_item_id] += 1
+
+    def record_retry(self) -> None:
+        with self.__lock:
+            self.__retries += 1
+
+    def record_outcome(self, resolved : bool) -> None:
+        with self.__lock:
+            if resolved:
+                self.__resolved += 1
+            else:
+                self.__exhausted += 1
+
+    def stats(self, hot_items : int = 10) -> RetryStats:
+        with self.__lock:
+            return RetryStats(sum(self.__conflicts.values()), self.__retries, self.__resolved, self.__exhausted, self.__conflicts.most_common(hot_items))
 
-class InventoryCommandHandlers:
-    def __init__(self, repository : IRepository[InventoryItem]) -> None:
-        self.__repository = repository
+
+@dataclass(frozen=True)
+class _Load:
+    id : Guid
+
+@dataclass(frozen=True)
+class _Save:
+    item : InventoryItem
+    expected_version : int
+
+@dataclass(frozen=True)
+class _Sleep:
+    seconds : float
+
+R = TypeVar("R")
+_Steps = Generator[_Load | _Save | _Sleep, Any, R]
+
+class _InventoryCommands:
+    retry_policy : RetryPolicy | None = None
 
     @dispatch(CreateInventoryItem)
-    def _handle(self, message : CreateInventoryItem) -> None:
-        item = InventoryItem(message.inventory_item_id, message.name)
-        self.__repository.save(item, -1)
+    def _execute(self, message : CreateInventoryItem, item : InventoryItem | None) -> InventoryItem:
+        if item is not None:
+            raise ConcurrencyError(f"{message.inventory_item_id} already exists")
+        return InventoryItem(message.inventory_item_id, message.name)
 
     @dispatch(DeactivateInventoryItem)
-    def _handle(self, message : DeactivateInventoryItem) -> None:
-        item = self.__repository.get_by_id(message.inventory_item_id)
+    def _execute(self, message : DeactivateInventoryItem, item : InventoryItem) -> InventoryItem:
         item.deactivate()
-        self.__repository.save(item, message.original_version)
+        return item
 
     @dispatch(RemoveItemsFromInventory)
-    def _handle(self, message : RemoveItemsFromInventory) -> None:
-        item = self.__repository.get_by_id(message.inventory_item_id)
+    def _execute(self, message : RemoveItemsFromInventory, item : InventoryItem) -> InventoryItem:
         item.remove(message.count)
-        self.__repository.save(item, message.original_version)
+        return item
 
     @dispatch(CheckInItemsToInventory)
-    def _handle(self, message : CheckInItemsToInventory) -> None:
-        item = self.__repository.get_by_id(message.inventory_item_id)
+    def _execute(self, message : CheckInItemsToInventory, item : InventoryItem) -> InventoryItem:
         item.check_in(message.count)
-        self.__repository.save(item, message.original_version)
+        return item
 
     @dispatch(RenameInventoryItem)
-    def _handle(self, message : RenameInventoryItem) -> None:
-        item = self.__repository.get_by_id(message.inventory_item_id)
+    def _execute(self, message : RenameInventoryItem, item : InventoryItem) -> InventoryItem:
         item.change_name(message.new_name)
-        self.__repository.save(item, message.original_version)
+        return item
 
     @dispatch(ChangeMaxQty)
-    def _handle(self, message : ChangeMaxQty) -> None:
-        item = self.__repository.get_by_id(message.inventory_item_id)
+    def _execute(self, message : ChangeMaxQty, item : InventoryItem) -> InventoryItem:
         item.change_max_qty(message.new_max_qty)
-        self.__repository.save(item, message.original_version)
+        return item
 
-    def handle(self, message : "Command")  -> None | GenericError:
+    @staticmethod
+    def _expected_version(message : "Command") -> int:
+        return -1 if isinstance(message, CreateInventoryItem) else message.original_version
+
+    @staticmethod
+    def _group_by_aggregate(messages : Sequence["Command"]) -> dict[Guid, list[int]]:
+        groups : dict[Guid, list[int]] = {}
+        for i, message in enumerate(messages):
+            groups.setdefault(message.inventory_item_id, []).append(i)
+        return groups
+
+    def _execute_group(self, messages : Sequence["Command"], indices : list[int], item : InventoryItem | None, results : list[None | Exception]) -> tuple[InventoryItem | None, list[int]]:
+        # each command must have been issued against the version the item has reached within the batch,
+        # which is exactly what handling the commands one by one would have checked
+        accepted : list[int] = []
+        for i in indices:
+            message = messages[i]
+            try:
+                if item is None and not isinstance(message, CreateInventoryItem):
+                    raise AggregateNotFoundError(message.inventory_item_id)
+                if item is not None and self._expected_version(message) != item.version + len(item.get_uncommitted_changes()):
+                    raise ConcurrencyError()
+                item = self._execute(message, item)
+                accepted.append(i)
+            except _REJECTIONS as e:
+                results[i] = e
+        return item, accepted
+
+    # The handling below is written once, as generators that yield the repository calls and sleeps they
+    # need; the sync and async handlers only differ in the driver that performs those steps.
+
+    def _handle_steps(self, message : "Command", rebase : bool = False) -> _Steps[None]:
+        item = None if isinstance(message, CreateInventoryItem) else (yield _Load(message.inventory_item_id))
+        expected_version = item.version if rebase else self._expected_version(message)
+        item = self._execute(message, item)
+        yield _Save(item, expected_version)
+
+    def _retry_steps(self, message : "Command") -> _Steps[None]:
+        policy = self.retry_policy
+        try:
+            yield from self._handle_steps(message)
+            return
+        except ConcurrencyError:
+            if policy is None or not policy.applies_to(message):
+                raise
+            policy.record_conflict(message)
+        for attempt in range(1, policy.max_attempts):
+            yield _Sleep(policy.backoff(attempt))
+            policy.record_retry()
+            try:
+                yield from self._handle_steps(message, rebase=True)
+                policy.record_outcome(True)
+                return
+            except ConcurrencyError:
+                policy.record_conflict(message)
+        policy.record_outcome(False)
+        raise ConcurrencyError(f"gave up after {policy.max_attempts} attempts")
+
+    def _handled_steps(self, message : "Command") -> _Steps[None | GenericError]:
+        started = time.perf_counter()
         try:
             print(message)
-            self._handle(message)
+            yield from self._retry_steps(message)
         except GenericError as e:
             print(e)
-            return e
\ No newline at end of file
+            _command_errors.labels(type(message).__name__, type(e).__name__).inc()
+            return e
+        finally:
+            _command_duration.labels(type(message).__name__).observe(time.perf_counter() - started)
+        return None
+
+    def _batch_steps(self, messages : Sequence["Command"]) -> _Steps[list[None | Exception]]:
+        results : list[None | Exception] = [None] * len(messages)
+        for id, indices in self._group_by_aggregate(messages).items():
+            item = None
+            if not isinstance(messages[indices[0]], CreateInventoryItem):
+                try:
+                    item = yield _Load(id)
+                except AggregateNotFoundError:
+                    pass
+            loaded_version = item.version if item is not None else -1
+            item, accepted = self._execute_group(messages, indices, item, results)
+            if not accepted:
+                continue
+            try:
+                yield _Save(item, loaded_version)
+            except GenericError as e:
+                for i in accepted:
+                    results[i] = e
+        return results
+
+
+def _run(steps : _Steps[R], repository : IRepository[InventoryItem]) -> R:
+    reply, error = None, None
+    while True:
+        try:
+            step = steps.send(reply) if error is None else steps.throw(error)
+        except StopIteration as done:
+            return done.value
+        reply, error = None, None
+        try:
+            if isinstance(step, _Load):
+                reply = repository.get_by_id(step.id)
+            elif isinstance(step, _Save):
+                repository.save(step.item, step.expected_version)
+            else:
+                time.sleep(step.seconds)
+        except Exception as e:
+            error = e
+
+async def _run_async(steps : _Steps[R], repository : IAsyncRepository[InventoryItem]) -> R:
+    reply, error = None, None
+    while True:
+        try:
+            step = steps.send(reply) if error is None else steps.throw(error)
+        except StopIteration as done:
+            return done.value
+        reply, error = None, None
+        try:
+            if isinstance(step, _Load):
+                reply = await repository.get_by_id(step.id)
+            elif isinstance(step, _Save):
+                await repository.save(step.item, step.expected_version)
+            else:
+                await asyncio.sleep(step.seconds)
+        except Exception as e:
+            error = e
+
+
+class InventoryCommandHandlers(_InventoryCommands):
+    def __init__(self, repository : IRepository[InventoryItem], retry_policy : RetryPolicy | None = None) -> None:
+        self.__repository = repository
+        self.retry_policy = retry_policy
+
+    def handle(self, message : "Command")  -> None | GenericError:
+        return _run(self._handled_steps(message), self.__repository)
+
+    def handle_batch(self, messages : Sequence["Command"]) -> list[None | Exception]:
+        """Handle many commands, loading and saving each aggregate once; results follow ``messages``."""
+        return _run(self._batch_steps(messages), self.__repository)
+
+
+class AsyncInventoryCommandHandlers(_InventoryCommands):
+    def __init__(self, repository : IAsyncRepository[InventoryItem], retry_policy : RetryPolicy | None = None) -> None:
+        self.__repository = repository
+        self.retry_policy = retry_policy
+
+    async def handle(self, message : "Command")  -> None | GenericError:
+        return await _run_async(self._handled_steps(message), self.__repository)
+
+    async def handle_batch(self, messages : Sequence["Command"]) -> list[None | Exception]:
+        return await _run_async(self._batch_steps(messages), self.__repository)
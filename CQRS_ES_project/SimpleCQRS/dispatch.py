@@ -0,0 +1,53 @@
+import inspect
+from types import MethodType
+from typing import Any, Callable
+
+class MethodDispatcher:
+    """Single-dispatch on the type of a method's first argument, resolved through a plain dict.
+
+    Overloads declared in a class body with ``@dispatch(SomeType)`` under the same name are collected
+    into one type->function table owned by the class. A subclass of a declared type is resolved through
+    its MRO once and then added to the table, so a call costs one dict lookup plus one function call.
+    """
+
+    def __init__(self, name : str, qualname : str) -> None:
+        self.__name__ = name
+        self.__qualname__ = qualname
+        self.handlers : dict[type, Callable[..., Any]] = {}
+        self.__table : dict[type, Callable[..., Any]] = {}
+
+    def add(self, types : tuple[type, ...], func : Callable[..., Any]) -> None:
+        for t in types:
+            self.handlers[t] = func
+        self.__table = dict(self.handlers)
+
+    def resolve(self, message_type : type) -> Callable[..., Any]:
+        for t in message_type.__mro__:
+            func = self.handlers.get(t)
+            if func is not None:
+                self.__table[message_type] = func
+                return func
+        raise NotImplementedError(f"Could not find signature for {self.__name__}: <{message_type.__name__}>")
+
+    def __get__(self, instance : Any, owner : type | None = None) -> Any:
+        if instance is None:
+            return self
+        # a plain bound method: nothing is stored on the instance, so no reference cycle is created
+        return MethodType(self, instance)
+
+    def __call__(self, instance : Any, message : Any, *args : Any) -> Any:
+        func = self.__table.get(type(message))
+        if func is None:
+            func = self.resolve(type(message))
+        return func(instance, message, *args)
+
+def dispatch(*types : type) -> Callable[[Callable[..., Any]], MethodDispatcher]:
+    def decorator(func : Callable[..., Any]) -> MethodDispatcher:
+        # overloads share a name inside one class body, so the dispatcher defined so far is found there
+        namespace = inspect.currentframe().f_back.f_locals
+        dispatcher = namespace.get(func.__name__)
+        if not isinstance(dispatcher, MethodDispatcher):
+            dispatcher = MethodDispatcher(func.__name__, func.__qualname__)
+        dispatcher.add(types, func)
+        return dispatcher
+    return decorator
@@ -1,15 +1,25 @@
 from __future__ import annotations
 import abc
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
 from .guid import Guid
 from .events import Event, InventoryItemDeactivated, InventoryItemRenamed,ItemsCheckedInToInventory, ItemsRemovedFromInventory, MaxQtyChanged,InventoryItemCreated
-from typing import Sequence, Generic, TypeVar, Type, NewType
-from multipledispatch import dispatch
-from .event_store import IEventStore
-from .exceptions import InvalidOperationError, AggregateNotFoundError
+from typing import Any, Iterable, Iterator, Sequence, Generic, TypeVar, Type, NewType
+from .dispatch import dispatch
+from .event_store import IAsyncEventStore, IEventStore
+from .snapshots import ISnapshotStore, Snapshot
+from .exceptions import InvalidOperationError, AggregateNotFoundError, ConcurrencyError
 
 class AggregateRoot(abc.ABC):
-    __changes : list[Event] = []
+    __changes : list[Event]
     __version : int
+
+    def __init__(self) -> None:
+        self.__changes = []
+        self.__version = -1
+
     @property
     @abc.abstractmethod
     def id(self) -> Guid:
@@ -23,11 +33,27 @@ class AggregateRoot(abc.ABC):
         return self.__changes
 
     def mark_changes_as_committed(self) -> None:
+        if self.__changes:
+            self.__version = self.__changes[-1].version
         self.__changes.clear()
 
     def loads_from_history(self, history : Sequence[Event]) -> None:
         for e in history:
             self.__apply_change(e, False)
+            self.__version = e.version
+
+    def get_snapshot(self) -> Snapshot:
+        return Snapshot(self.id, self.__version, self._get_snapshot_state())
+
+    def restore_from_snapshot(self, snapshot : Snapshot) -> None:
+        self._restore_snapshot_state(snapshot.state)
+        self.__version = snapshot.version
+
+    def _get_snapshot_state(self) -> dict[str, Any]:
+        raise NotImplementedError(f"{self.__class__.__name__} does not support snapshots")
+
+    def _restore_snapshot_state(self, state : dict[str, Any]) -> None:
+        raise NotImplementedError(f"{self.__class__.__name__} does not support snapshots")
 
     # @dispatch(Event)
     @abc.abstractmethod
@@ -84,9 +110,21 @@ class InventoryItem(AggregateRoot):
 
 
     def __init__(self, id : Guid | None = None, name : str | None = None) -> None:
+        super().__init__()
         if id and name:
             self._apply_change(InventoryItemCreated(id, name, self.max_qty))
 
+    def _get_snapshot_state(self) -> dict[str, Any]:
+        return {"id" : self.__id, "activated" : self.__activated, "name" : self.name,
+                "available_qty" : self.available_qty, "max_qty" : self.max_qty}
+
+    def _restore_snapshot_state(self, state : dict[str, Any]) -> None:
+        self.__id = state["id"]
+        self.__activated = state["activated"]
+        self.name = state["name"]
+        self.available_qty = state["available_qty"]
+        self.max_qty = state["max_qty"]
+
 
     @dispatch(InventoryItemCreated)
     def _apply(self : InventoryItem, e : InventoryItemCreated) -> None:
@@ -127,21 +165,192 @@ class IRepository(Generic[T], abc.ABC):
  def get_by_id(self, id : Guid) -> T:
      raise NotImplementedError
 
-class Repository(IRepository[T], Generic[T]):
-    __storage : IEventStore
+def _crosses_snapshot_boundary(version : int, changes : int, every : int) -> bool:
+    # versions are 0-based, so a stream at version v holds v + 1 events; a snapshot is taken each time
+    # a save carries the event count past a multiple of ``every``, never on a first short save
+    count = version + 1
+    return count // every > (count - changes) // every
 
-    def __init__(self, storage : IEventStore, class_type : Type[T]) -> None:
-        self.__storage = storage
+class _RepositoryBase(Generic[T]):
+    """Everything the sync and async repositories share; they differ only in awaiting the event store."""
+
+    def __init__(self, class_type : Type[T], snapshot_store : ISnapshotStore | None, snapshot_every : int) -> None:
         self.class_type = class_type
+        self.__snapshot_store = snapshot_store
+        self.__snapshot_every = snapshot_every
 
-    def save(self, aggregate : AggregateRoot, expected_version : int) -> None:
-        self.__storage.save_events(aggregate.id, aggregate.get_uncommitted_changes(), expected_version)
+    def _committed(self, aggregate : AggregateRoot, changes : int) -> None:
         aggregate.mark_changes_as_committed()
+        if self.__snapshot_store and _crosses_snapshot_boundary(aggregate.version, changes, self.__snapshot_every):
+            self.__snapshot_store.save_snapshot(aggregate.get_snapshot())
 
-    def get_by_id(self, id: Guid) -> T:
-        obj = self.class_type()
-        e = self.__storage.get_events_for_aggregate(id)
-        if not e:
+    def _latest_snapshot(self, id : Guid) -> Snapshot | None:
+        return self.__snapshot_store.get_latest_snapshot(id) if self.__snapshot_store else None
+
+    def _rebuild(self, id : Guid, snapshot : Snapshot | None, events : Sequence[Event] | None) -> T:
+        # after a snapshot an empty tail is fine, without one an empty stream means there is no aggregate
+        if events is None or (snapshot is None and not events):
             raise AggregateNotFoundError(id)
-        obj.loads_from_history(e)
+        obj = self.class_type()
+        if snapshot:
+            obj.restore_from_snapshot(snapshot)
+        obj.loads_from_history(events)
         return obj
+
+class Repository(_RepositoryBase[T], IRepository[T]):
+    __storage : IEventStore
+
+    def __init__(self, storage : IEventStore, class_type : Type[T], snapshot_store : ISnapshotStore | None = None, snapshot_every : int = 100) -> None:
+        super().__init__(class_type, snapshot_store, snapshot_every)
+        self.__storage = storage
+
+    def save(self, aggregate : AggregateRoot, expected_version : int) -> None:
+        changes = aggregate.get_uncommitted_changes()
+        count = len(changes)
+        self.__storage.save_events(aggregate.id, changes, expected_version)
+        self._committed(aggregate, count)
+
+    def get_by_id(self, id: Guid) -> T:
+        snapshot = self._latest_snapshot(id)
+        return self._rebuild(id, snapshot, self.__storage.get_events_for_aggregate(id, snapshot.version + 1 if snapshot else 0))
+
+
+class IAsyncRepository(Generic[T], abc.ABC):
+
+    @abc.abstractmethod
+    async def save(self, aggregate : AggregateRoot, expected_version : int) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_by_id(self, id : Guid) -> T:
+        raise NotImplementedError
+
+class AsyncRepository(_RepositoryBase[T], IAsyncRepository[T]):
+    __storage : IAsyncEventStore
+
+    def __init__(self, storage : IAsyncEventStore, class_type : Type[T], snapshot_store : ISnapshotStore | None = None, snapshot_every : int = 100) -> None:
+        super().__init__(class_type, snapshot_store, snapshot_every)
+        self.__storage = storage
+
+    async def save(self, aggregate : AggregateRoot, expected_version : int) -> None:
+        changes = aggregate.get_uncommitted_changes()
+        count = len(changes)
+        await self.__storage.save_events(aggregate.id, changes, expected_version)
+        self._committed(aggregate, count)
+
+    async def get_by_id(self, id: Guid) -> T:
+        snapshot = self._latest_snapshot(id)
+        return self._rebuild(id, snapshot, await self.__storage.get_events_for_aggregate(id, snapshot.version + 1 if snapshot else 0))
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits : int
+    misses : int
+    evictions : int
+    invalidations : int
+    size : int
+
+class _AggregateCache(Generic[T]):
+    def __init__(self, max_size : int) -> None:
+        self.__max_size = max_size
+        self.__entries : OrderedDict[Guid, T] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def take(self, id : Guid) -> T | None:
+        # an instance is handed to one caller at a time: it leaves the cache here and comes back
+        # through put once its changes are saved, so a concurrent caller loads its own copy
+        with self.__lock:
+            aggregate = self.__entries.pop(id, None)
+            if aggregate is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return aggregate
+
+    def put(self, aggregate : T) -> None:
+        with self.__lock:
+            current = self.__entries.get(aggregate.id)
+            if current is not None and current.version > aggregate.version:
+                return
+            self.__entries[aggregate.id] = aggregate
+            self.__entries.move_to_end(aggregate.id)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, id : Guid) -> None:
+        with self.__lock:
+            if self.__entries.pop(id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> CacheStats:
+        with self.__lock:
+            return CacheStats(self.hits, self.misses, self.evictions, self.invalidations, len(self.__entries))
+
+class _CachingRepositoryBase(Generic[T]):
+    """Identity map in front of a repository: aggregates saved recently stay loaded and are brought up to
+    the store's latest version on the next hit. A hit checks the instance out of the cache, so concurrent
+    callers never share one; it is returned by a successful save and dropped otherwise."""
+
+    def __init__(self, max_size : int) -> None:
+        self.__cache : _AggregateCache[T] = _AggregateCache(max_size)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.__cache.stats()
+
+    @contextmanager
+    def _saving(self, aggregate : AggregateRoot) -> Iterator[None]:
+        try:
+            yield
+        except ConcurrencyError:
+            self.__cache.invalidate(aggregate.id)
+            raise
+        self.__cache.put(aggregate)
+
+    def _take(self, id : Guid) -> T | None:
+        return self.__cache.take(id)
+
+    @staticmethod
+    def _caught_up(aggregate : T, events : Iterable[Event] | None) -> T:
+        aggregate.loads_from_history(events or ())
+        return aggregate
+
+class CachingRepository(_CachingRepositoryBase[T], IRepository[T]):
+
+    def __init__(self, repository : IRepository[T], storage : IEventStore, max_size : int = 1024) -> None:
+        super().__init__(max_size)
+        self.__repository = repository
+        self.__storage = storage
+
+    def save(self, aggregate : AggregateRoot, expected_version : int) -> None:
+        with self._saving(aggregate):
+            self.__repository.save(aggregate, expected_version)
+
+    def get_by_id(self, id : Guid) -> T:
+        aggregate = self._take(id)
+        if aggregate is None:
+            return self.__repository.get_by_id(id)
+        return self._caught_up(aggregate, self.__storage.iter_events_for_aggregate(id, aggregate.version + 1))
+
+class AsyncCachingRepository(_CachingRepositoryBase[T], IAsyncRepository[T]):
+
+    def __init__(self, repository : IAsyncRepository[T], storage : IAsyncEventStore, max_size : int = 1024) -> None:
+        super().__init__(max_size)
+        self.__repository = repository
+        self.__storage = storage
+
+    async def save(self, aggregate : AggregateRoot, expected_version : int) -> None:
+        with self._saving(aggregate):
+            await self.__repository.save(aggregate, expected_version)
+
+    async def get_by_id(self, id : Guid) -> T:
+        aggregate = self._take(id)
+        if aggregate is None:
+            return await self.__repository.get_by_id(id)
+        return self._caught_up(aggregate, await self.__storage.get_events_for_aggregate(id, aggregate.version + 1))
@@ -1,9 +1,34 @@
 import abc
+import asyncio
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Executor, Future
+from itertools import islice
 from .guid import Guid
-from typing import Sequence
+from typing import AsyncIterator, Iterator, Sequence, overload
 from .events import Event
+from .codec import MessageCodec, default_codec
 from .fake_bus import IEventPublisher
-from .exceptions import ConcurrencyError
+from .exceptions import ConcurrencyError, InvalidOperationError, PublishError
+from .metrics import default_registry, SIZE_BUCKETS
+
+_append_duration = default_registry.histogram("cqrs_event_store_append_duration_seconds", "Time to append one commit, publishing included.", ("store",))
+_stream_length = default_registry.histogram("cqrs_event_store_stream_length_events", "Length of a stream after a commit to it.", ("store",), SIZE_BUCKETS)
+
+def _publish(publisher : IEventPublisher, events : Sequence[Event], results : list[ConcurrencyError | None] | None = None) -> None:
+    # the commit is durable by now, so a failing publisher must not read as a failed append
+    try:
+        publisher.publish_many(events)
+    except Exception as e:
+        raise PublishError(e, results) from e
 
 class IEventStore(abc.ABC):
     @abc.abstractmethod
@@ -11,14 +36,44 @@ class IEventStore(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_events_for_aggregate(self, aggregate_id : Guid) -> list[Event]:
+    def get_events_for_aggregate(self, aggregate_id : Guid, from_version : int = 0, to_version : int | None = None) -> Sequence[Event] | None:
+        """Return the events with ``from_version <= version <= to_version``, or None for an unknown aggregate."""
+        raise NotImplementedError
+
+    def iter_events_for_aggregate(self, aggregate_id : Guid, from_version : int = 0, to_version : int | None = None) -> Iterator[Event]:
+        return iter(self.get_events_for_aggregate(aggregate_id, from_version, to_version) or ())
+
+    def save_events_batch(self, batch : Sequence[tuple[Guid, Sequence[Event], int]]) -> list[ConcurrencyError | None]:
+        results : list[ConcurrencyError | None] = []
+        failure : Exception | None = None
+        for aggregate_id, events, expected_version in batch:
+            try:
+                self.save_events(aggregate_id, events, expected_version)
+                results.append(None)
+            except ConcurrencyError as e:
+                results.append(e)
+            except PublishError as e:
+                results.append(None)
+                failure = failure or e.cause
+        if failure is not None:
+            raise PublishError(failure, results)
+        return results
+
+    @abc.abstractmethod
+    def read_all(self, from_position : int = 0, batch_size : int = 500) -> Iterator["EventDescriptor"]:
+        """Stream every committed event in commit order, starting after the checkpoint ``from_position``.
+
+        Positions start at 1, so a consumer that saves the position of the last event it processed
+        can pass it back to resume exactly where it stopped.
+        """
         raise NotImplementedError
 
 class EventDescriptor:
-    def __init__(self, id : Guid, event_data : Event, version : int) -> None:
+    def __init__(self, id : Guid, event_data : Event, version : int, position : int = 0) -> None:
         self.__event_data = event_data
         self.__version = version
         self.__id = id
+        self.__position = position
 
     @property
     def event_data(self) -> Event:
@@ -32,33 +87,641 @@ class EventDescriptor:
     def id(self) -> Guid:
         return self.__id
 
+    @property
+    def position(self) -> int:
+        return self.__position
+
 class EventStore(IEventStore):
 
     def __init__(self, publisher :IEventPublisher) -> None:
         self.__publisher = publisher
-
-    __current : dict[Guid, list[EventDescriptor]] = {}
+        self.__append_duration = _append_duration.labels("memory")
+        self.__stream_length = _stream_length.labels("memory")
+        self.__current : dict[Guid, list[EventDescriptor]] = {}
+        self.__log : list[EventDescriptor] = []
+        # the version check and the append are atomic per aggregate; aggregates hashing to different
+        # stripes append in parallel and only take the log lock to be given their global positions
+        self.__stripes : list[threading.Lock] = [threading.Lock() for _ in range(64)]
+        self.__log_lock = threading.Lock()
 
     def save_events(self, aggregate_id: Guid, events: Sequence[Event], expected_version: int) -> None:
-        event_descriptors = self.__current.get(aggregate_id)
-        if not event_descriptors:
-            event_descriptors = []
-            self.__current[aggregate_id] = event_descriptors
+        started = time.perf_counter()
+        with self.__stripes[hash(aggregate_id) % len(self.__stripes)]:
+            event_descriptors = self.__current.get(aggregate_id)
+            if not event_descriptors:
+                event_descriptors = []
+                self.__current[aggregate_id] = event_descriptors
 
-        elif event_descriptors[len(event_descriptors)-1].version != expected_version and expected_version != -1:
-            raise ConcurrencyError()
+            elif event_descriptors[len(event_descriptors)-1].version != expected_version and expected_version != -1:
+                raise ConcurrencyError()
 
-        i = expected_version
+            i = expected_version
+            # one log lock per commit, so the events of a commit get contiguous global positions
+            with self.__log_lock:
+                log = self.__log
+                for event in events:
+                    i += 1
+                    event.version = i
+                    descriptor = EventDescriptor(aggregate_id, event, i, len(log) + 1)
+                    log.append(descriptor)
+                    event_descriptors.append(descriptor)
 
-        for event in events:
-            i += 1
-            event.version = i
-            event_descriptors.append(EventDescriptor(aggregate_id, event, i))
-            self.__publisher.publish(event)
+            # publish only once the whole commit is appended, so a failing handler cannot leave it half-written
+            _publish(self.__publisher, events)
 
-    def get_events_for_aggregate(self, aggregate_id: Guid) -> list[Event] | None:
+            self.__stream_length.observe(len(event_descriptors))
+        self.__append_duration.observe(time.perf_counter() - started)
+
+    def __bounds(self, event_descriptors : list[EventDescriptor], from_version : int, to_version : int | None) -> range:
+        start = bisect_left(event_descriptors, from_version, key=lambda d: d.version) if from_version > 0 else 0
+        stop = len(event_descriptors) if to_version is None else bisect_right(event_descriptors, to_version, key=lambda d: d.version)
+        return range(start, stop)
+
+    def get_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> list[Event] | None:
         event_descriptors = self.__current.get(aggregate_id)
         if event_descriptors is None:
             return None
 
-        return [desc.event_data for desc in event_descriptors]
+        return [event_descriptors[i].event_data for i in self.__bounds(event_descriptors, from_version, to_version)]
+
+    def iter_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> Iterator[Event]:
+        event_descriptors = self.__current.get(aggregate_id)
+        if event_descriptors is None:
+            return
+        for i in self.__bounds(event_descriptors, from_version, to_version):
+            yield event_descriptors[i].event_data
+
+    def read_all(self, from_position: int = 0, batch_size: int = 500) -> Iterator[EventDescriptor]:
+        # position p lives at index p - 1; slicing one batch at a time keeps appends made while
+        # a consumer is iterating visible without ever copying the whole log
+        position = from_position
+        while True:
+            batch = self.__log[position:position + batch_size]
+            if not batch:
+                return
+            yield from batch
+            position += len(batch)
+
+
+class _StreamIndex:
+    __slots__ = ("versions", "segments", "offsets", "lengths")
+
+    def __init__(self) -> None:
+        self.versions = array("q")
+        self.segments = array("I")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+
+    def __len__(self) -> int:
+        return len(self.versions)
+
+    def append(self, version : int, segment : int, offset : int, length : int) -> None:
+        self.versions.append(version)
+        self.segments.append(segment)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def bounds(self, from_version : int, to_version : int | None) -> tuple[int, int]:
+        versions = self.versions
+        start = bisect_left(versions, from_version) if from_version > 0 else 0
+        stop = len(versions) if to_version is None else bisect_right(versions, to_version)
+        return start, max(start, stop)
+
+
+class EventStream(Sequence[Event]):
+    """Lazy view over one aggregate stream; events are decoded from the mapped segments on access."""
+
+    def __init__(self, store : "FileEventStore", index : _StreamIndex, start : int, stop : int) -> None:
+        self.__store = store
+        self.__index = index
+        self.__start = start
+        self.__length = stop - start
+
+    def __len__(self) -> int:
+        return self.__length
+
+    @overload
+    def __getitem__(self, i : int) -> Event: ...
+    @overload
+    def __getitem__(self, i : slice) -> list[Event]: ...
+
+    def __getitem__(self, i : int | slice) -> Event | list[Event]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.__length))]
+        if i < 0:
+            i += self.__length
+        if not 0 <= i < self.__length:
+            raise IndexError(i)
+        i += self.__start
+        index = self.__index
+        return self.__store._read(index.segments[i], index.offsets[i], index.lengths[i])
+
+
+class FileEventStore(IEventStore):
+    # record: payload length, payload crc32, version, aggregate id length, then aggregate id and payload
+    __header = struct.Struct("<IIqH")
+
+    def __init__(self, publisher : IEventPublisher, directory : str, max_segment_size : int = 64 * 1024 * 1024, fsync : bool = True, codec : MessageCodec = default_codec) -> None:
+        self.__publisher = publisher
+        self.__codec = codec
+        self.__append_duration = _append_duration.labels("file")
+        self.__stream_length = _stream_length.labels("file")
+        self.__directory = directory
+        self.__max_segment_size = max_segment_size
+        self.__fsync = fsync
+        self.__index : dict[Guid, _StreamIndex] = {}
+        self.__log_segments = array("I")
+        self.__log_offsets = array("Q")
+        self.__maps : dict[int, mmap.mmap] = {}
+        self.__lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        segments = sorted(int(name[8:-4]) for name in os.listdir(directory) if name.startswith("segment-") and name.endswith(".log"))
+        for segment in segments:
+            self.__recover(segment)
+        self.__segment = segments[-1] if segments else 0
+        self.__file = open(self.__path(self.__segment), "ab")
+
+    def __path(self, segment : int) -> str:
+        return os.path.join(self.__directory, f"segment-{segment:06d}.log")
+
+    def __recover(self, segment : int) -> None:
+        header = self.__header
+        with open(self.__path(segment), "r+b") as f:
+            data = f.read()
+            pos = 0
+            while pos + header.size <= len(data):
+                length, crc, version, id_length = header.unpack_from(data, pos)
+                start = pos + header.size + id_length
+                end = start + length
+                if end > len(data) or zlib.crc32(data[start:end]) != crc:
+                    break
+                aggregate_id = data[pos + header.size:start].decode()
+                self.__index.setdefault(aggregate_id, _StreamIndex()).append(version, segment, start, length)
+                self.__log_segments.append(segment)
+                self.__log_offsets.append(pos)
+                pos = end
+            if pos != len(data):
+                # drop a torn write left by a crash in the middle of an append
+                f.truncate(pos)
+
+    def __map(self, segment : int, end : int) -> mmap.mmap:
+        view = self.__maps.get(segment)
+        if view is None or len(view) < end:
+            # the active segment keeps growing, so its mapping is refreshed once a read goes past it;
+            # a superseded mapping is left to the garbage collector as another reader may still use it
+            with open(self.__path(segment), "rb") as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__maps[segment] = view
+        return view
+
+    def _read(self, segment : int, offset : int, length : int) -> Event:
+        end = offset + length
+        return self.__codec.decode(self.__map(segment, end)[offset:end])
+
+    def __read_record(self, segment : int, offset : int, position : int) -> EventDescriptor:
+        header = self.__header
+        view = self.__map(segment, offset + header.size)
+        length, _, version, id_length = header.unpack_from(view, offset)
+        start = offset + header.size
+        aggregate_id = view[start:start + id_length].decode()
+        return EventDescriptor(aggregate_id, self._read(segment, start + id_length, length), version, position)
+
+    def __roll_segment(self) -> None:
+        self.__file.close()
+        self.__segment += 1
+        self.__file = open(self.__path(self.__segment), "ab")
+
+    def __discard_tail(self, position : int) -> None:
+        # part of a failed batch may be in the file or still in the write buffer; the handle is replaced
+        # so nothing buffered reaches the file later, and the segment is cut back to the last commit
+        try:
+            self.__file.close()
+        except OSError as e:
+            print(e)
+        path = self.__path(self.__segment)
+        os.truncate(path, position)
+        self.__file = open(path, "ab")
+
+    def save_events(self, aggregate_id: Guid, events: Sequence[Event], expected_version: int) -> None:
+        error = self.save_events_batch([(aggregate_id, events, expected_version)])[0]
+        if error:
+            raise error
+
+    def save_events_batch(self, batch: Sequence[tuple[Guid, Sequence[Event], int]]) -> list[ConcurrencyError | None]:
+        started = time.perf_counter()
+        with self.__lock:
+            if self.__file.tell() >= self.__max_segment_size:
+                self.__roll_segment()
+
+            header = self.__header
+            position = self.__file.tell()
+            buffer = bytearray()
+            results : list[ConcurrencyError | None] = []
+            accepted : list[tuple[Guid, Sequence[Event], list[tuple[int, int, int, int]]]] = []
+            last_versions : dict[Guid, int] = {}
+            for aggregate_id, events, expected_version in batch:
+                index = self.__index.get(aggregate_id)
+                last_version = last_versions.get(aggregate_id, index.versions[-1] if index else None)
+                if last_version is not None and last_version != expected_version and expected_version != -1:
+                    results.append(ConcurrencyError())
+                    continue
+
+                encoded_id = aggregate_id.encode()
+                locations : list[tuple[int, int, int, int]] = []
+                i = expected_version
+                for event in events:
+                    i += 1
+                    event.version = i
+                    payload = self.__codec.encode(event)
+                    record = position + len(buffer)
+                    buffer += header.pack(len(payload), zlib.crc32(payload), i, len(encoded_id))
+                    buffer += encoded_id
+                    locations.append((i, record, position + len(buffer), len(payload)))
+                    buffer += payload
+                if locations:
+                    last_versions[aggregate_id] = i
+                accepted.append((aggregate_id, events, locations))
+                results.append(None)
+
+            # one write and one sync for the whole batch
+            try:
+                self.__file.write(buffer)
+                self.__file.flush()
+                if self.__fsync:
+                    os.fsync(self.__file.fileno())
+            except BaseException:
+                self.__discard_tail(position)
+                raise
+
+            for aggregate_id, _, locations in accepted:
+                index = self.__index.get(aggregate_id)
+                if index is None:
+                    index = self.__index[aggregate_id] = _StreamIndex()
+                for version, record, offset, length in locations:
+                    index.append(version, self.__segment, offset, length)
+                    self.__log_segments.append(self.__segment)
+                    self.__log_offsets.append(record)
+                self.__stream_length.observe(len(index))
+
+            # published under the lock, so projections see commits in the order they were written
+            _publish(self.__publisher, [event for _, events, _ in accepted for event in events], results)
+        # every commit of the batch waited for the whole batch
+        elapsed = time.perf_counter() - started
+        for _ in accepted:
+            self.__append_duration.observe(elapsed)
+        return results
+
+    def get_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> EventStream | None:
+        index = self.__index.get(aggregate_id)
+        if index is None:
+            return None
+        return EventStream(self, index, *index.bounds(from_version, to_version))
+
+    def iter_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> Iterator[Event]:
+        return iter(self.get_events_for_aggregate(aggregate_id, from_version, to_version) or ())
+
+    def read_all(self, from_position: int = 0, batch_size: int = 500) -> Iterator[EventDescriptor]:
+        position = from_position
+        while position < len(self.__log_offsets):
+            end = min(position + batch_size, len(self.__log_offsets))
+            for i in range(position, end):
+                yield self.__read_record(self.__log_segments[i], self.__log_offsets[i], i + 1)
+            position = end
+
+    def close(self) -> None:
+        self.__file.close()
+        for view in self.__maps.values():
+            view.close()
+        self.__maps.clear()
+
+
+_MAX_VERSION = 2 ** 63 - 1
+
+class SqliteEventStore(IEventStore):
+
+    def __init__(self, publisher : IEventPublisher, path : str = ":memory:", synchronous : str = "FULL", codec : MessageCodec = default_codec) -> None:
+        self.__publisher = publisher
+        self.__codec = codec
+        self.__append_duration = _append_duration.labels("sqlite")
+        self.__stream_length = _stream_length.labels("sqlite")
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(f"PRAGMA synchronous={synchronous}")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "position INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "aggregate_id TEXT NOT NULL, "
+            "version INTEGER NOT NULL, "
+            "data BLOB NOT NULL)")
+        self.__connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_events_stream ON events (aggregate_id, version)")
+
+    def save_events(self, aggregate_id: Guid, events: Sequence[Event], expected_version: int) -> None:
+        error = self.save_events_batch([(aggregate_id, events, expected_version)])[0]
+        if error:
+            raise error
+
+    def save_events_batch(self, batch: Sequence[tuple[Guid, Sequence[Event], int]]) -> list[ConcurrencyError | None]:
+        started = time.perf_counter()
+        results : list[ConcurrencyError | None] = []
+        with self.__lock:
+            cursor = self.__connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for aggregate_id, events, expected_version in batch:
+                    rows = []
+                    i = expected_version
+                    for event in events:
+                        i += 1
+                        event.version = i
+                        rows.append((aggregate_id, i, self.__codec.encode(event)))
+
+                    # an expected version the stream never reached is stale too; the probe is a single
+                    # index lookup, the race itself is left to the unique index below
+                    if expected_version != -1 and not cursor.execute(
+                            "SELECT EXISTS (SELECT 1 FROM events WHERE aggregate_id = ? AND version = ?) "
+                            "OR NOT EXISTS (SELECT 1 FROM events WHERE aggregate_id = ?)",
+                            (aggregate_id, expected_version, aggregate_id)).fetchone()[0]:
+                        results.append(ConcurrencyError())
+                        continue
+
+                    # a concurrent writer that got there first already owns expected_version + 1,
+                    # so the unique stream index rejects this append and only its savepoint is undone
+                    cursor.execute("SAVEPOINT append")
+                    try:
+                        cursor.executemany("INSERT INTO events (aggregate_id, version, data) VALUES (?, ?, ?)", rows)
+                    except sqlite3.IntegrityError:
+                        cursor.execute("ROLLBACK TO append")
+                        results.append(ConcurrencyError())
+                    else:
+                        results.append(None)
+                    cursor.execute("RELEASE append")
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
+            # published under the lock, so projections see commits in the order they were written
+            _publish(self.__publisher, [event for (_, events, _), error in zip(batch, results) if error is None for event in events], results)
+        elapsed = time.perf_counter() - started
+        for (_, events, expected_version), error in zip(batch, results):
+            if error is None:
+                # versions are contiguous from 0, so the last one appended gives the stream length
+                self.__stream_length.observe(expected_version + len(events) + 1)
+                self.__append_duration.observe(elapsed)
+        return results
+
+    def get_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> list[Event] | None:
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT data FROM events WHERE aggregate_id = ? AND version >= ? AND version <= ? ORDER BY version",
+                (aggregate_id, from_version, _MAX_VERSION if to_version is None else to_version)).fetchall()
+            if not rows and not self.__connection.execute("SELECT 1 FROM events WHERE aggregate_id = ? LIMIT 1", (aggregate_id,)).fetchone():
+                return None
+        return [self.__codec.decode(data) for data, in rows]
+
+    def iter_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None, batch_size : int = 500) -> Iterator[Event]:
+        to_version = _MAX_VERSION if to_version is None else to_version
+        while True:
+            with self.__lock:
+                rows = self.__connection.execute(
+                    "SELECT version, data FROM events WHERE aggregate_id = ? AND version >= ? AND version <= ? ORDER BY version LIMIT ?",
+                    (aggregate_id, from_version, to_version, batch_size)).fetchall()
+            for _, data in rows:
+                yield self.__codec.decode(data)
+            if len(rows) < batch_size:
+                return
+            from_version = rows[-1][0] + 1
+
+    def read_all(self, from_position: int = 0, batch_size: int = 500) -> Iterator[EventDescriptor]:
+        position = from_position
+        while True:
+            with self.__lock:
+                rows = self.__connection.execute(
+                    "SELECT position, aggregate_id, version, data FROM events WHERE position > ? ORDER BY position LIMIT ?",
+                    (position, batch_size)).fetchall()
+            if not rows:
+                return
+            for position, aggregate_id, version, data in rows:
+                yield EventDescriptor(aggregate_id, self.__codec.decode(data), version, position)
+
+    def close(self) -> None:
+        self.__connection.close()
+
+
+class GroupCommitEventStore(IEventStore):
+    """Merges appends from concurrent callers into one ``save_events_batch`` call on the wrapped store.
+
+    Appends that arrive while a batch is being written form the next batch, so durable stores pay one
+    write and one sync per batch while every caller still gets its own result. ``max_batch_delay``
+    additionally holds a batch open for up to that many seconds to let more callers join.
+    """
+
+    def __init__(self, store : IEventStore, max_batch_delay : float = 0.0, max_batch_size : int = 256) -> None:
+        self.__store = store
+        self.__append_duration = _append_duration.labels("group-commit")
+        self.__stream_length = _stream_length.labels("group-commit")
+        self.__max_batch_delay = max_batch_delay
+        self.__max_batch_size = max_batch_size
+        self.__pending : list[tuple[Guid, Sequence[Event], int, Future[None]]] = []
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__committer = threading.Thread(target=self.__run, name="group-commit", daemon=True)
+        self.__committer.start()
+
+    def save_events(self, aggregate_id: Guid, events: Sequence[Event], expected_version: int) -> None:
+        started = time.perf_counter()
+        future : Future[None] = Future()
+        with self.__condition:
+            if self.__closed:
+                raise InvalidOperationError("event store is closed")
+            self.__pending.append((aggregate_id, events, expected_version, future))
+            self.__condition.notify()
+        future.result()
+        # the wait for a batch to form is included, which the wrapped store's own timings leave out
+        self.__stream_length.observe(expected_version + len(events) + 1)
+        self.__append_duration.observe(time.perf_counter() - started)
+
+    def get_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> Sequence[Event] | None:
+        return self.__store.get_events_for_aggregate(aggregate_id, from_version, to_version)
+
+    def iter_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> Iterator[Event]:
+        return self.__store.iter_events_for_aggregate(aggregate_id, from_version, to_version)
+
+    def read_all(self, from_position: int = 0, batch_size: int = 500) -> Iterator[EventDescriptor]:
+        return self.__store.read_all(from_position, batch_size)
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__pending and not self.__closed:
+                    self.__condition.wait()
+                if not self.__pending:
+                    return
+                deadline = time.monotonic() + self.__max_batch_delay
+                while len(self.__pending) < self.__max_batch_size and not self.__closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+                batch = self.__pending[:self.__max_batch_size]
+                del self.__pending[:self.__max_batch_size]
+
+            published : PublishError | None = None
+            try:
+                results = self.__store.save_events_batch([(aggregate_id, events, expected_version) for aggregate_id, events, expected_version, _ in batch])
+            except PublishError as e:
+                # the batch is durable: conflicts keep their own error and committed callers learn that
+                # only the publishing failed, so none of them retries an append that already happened
+                published, results = e, e.results
+            except BaseException as e:
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            for (*_, future), error in zip(batch, results):
+                if error is not None:
+                    future.set_exception(error)
+                elif published is not None:
+                    future.set_exception(PublishError(published.cause))
+                else:
+                    future.set_result(None)
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__committer.join()
+
+
+class ColumnarEventStore(IEventStore):
+    """Memory-lean in-memory store: events live as codec records in one buffer, addressed by parallel
+    typed columns, and are rebuilt into ``Event`` objects only when read."""
+
+    def __init__(self, publisher : IEventPublisher, codec : MessageCodec = default_codec) -> None:
+        self.__publisher = publisher
+        self.__codec = codec
+        self.__append_duration = _append_duration.labels("columnar")
+        self.__stream_length = _stream_length.labels("columnar")
+        self.__lock = threading.Lock()
+        self.__aggregate_numbers : dict[Guid, int] = {}
+        self.__aggregate_ids : list[Guid] = []
+        self.__streams : list[array] = []
+        # one row per event in commit order; row r holds the event at global position r + 1
+        self.__aggregates = array("I")
+        self.__versions = array("q")
+        # the codec tag of each row, so events can be counted by type without decoding them
+        self.__tags = array("B")
+        self.__offsets = array("Q", [0])
+        self.__payload = bytearray()
+
+    def save_events(self, aggregate_id: Guid, events: Sequence[Event], expected_version: int) -> None:
+        started = time.perf_counter()
+        with self.__lock:
+            number = self.__aggregate_numbers.get(aggregate_id)
+            if number is not None:
+                rows = self.__streams[number]
+                if rows and self.__versions[rows[-1]] != expected_version and expected_version != -1:
+                    raise ConcurrencyError()
+
+            # every record is encoded before any column grows, so an event the codec rejects cannot
+            # leave part of the commit behind
+            records = []
+            tags = array("B")
+            i = expected_version
+            for event in events:
+                i += 1
+                event.version = i
+                records.append(self.__codec.encode(event))
+                tags.append(self.__codec.tag_of(type(event)))
+
+            if number is None:
+                number = len(self.__aggregate_ids)
+                self.__aggregate_ids.append(sys.intern(aggregate_id))
+                self.__aggregate_numbers[self.__aggregate_ids[number]] = number
+                rows = array("I")
+                self.__streams.append(rows)
+
+            for event, record in zip(events, records):
+                rows.append(len(self.__versions))
+                self.__aggregates.append(number)
+                self.__versions.append(event.version)
+                self.__payload += record
+                self.__offsets.append(len(self.__payload))
+            self.__tags += tags
+
+            # published under the lock, so projections see commits in the order they were written
+            _publish(self.__publisher, events)
+
+            self.__stream_length.observe(len(rows))
+        self.__append_duration.observe(time.perf_counter() - started)
+
+    def __event(self, row : int) -> Event:
+        return self.__codec.decode(self.__payload[self.__offsets[row]:self.__offsets[row + 1]])
+
+    def __bounds(self, rows : array, from_version : int, to_version : int | None) -> range:
+        versions = self.__versions
+        start = bisect_left(rows, from_version, key=versions.__getitem__) if from_version > 0 else 0
+        stop = len(rows) if to_version is None else bisect_right(rows, to_version, key=versions.__getitem__)
+        return range(start, stop)
+
+    def get_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> list[Event] | None:
+        return None if aggregate_id not in self.__aggregate_numbers else list(self.iter_events_for_aggregate(aggregate_id, from_version, to_version))
+
+    def iter_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> Iterator[Event]:
+        number = self.__aggregate_numbers.get(aggregate_id)
+        if number is None:
+            return
+        rows = self.__streams[number]
+        for i in self.__bounds(rows, from_version, to_version):
+            yield self.__event(rows[i])
+
+    def read_all(self, from_position: int = 0, batch_size: int = 500) -> Iterator[EventDescriptor]:
+        row = from_position
+        while row < len(self.__versions):
+            end = min(row + batch_size, len(self.__versions))
+            for r in range(row, end):
+                yield EventDescriptor(self.__aggregate_ids[self.__aggregates[r]], self.__event(r), self.__versions[r], r + 1)
+            row = end
+
+    def count_events_of_type(self, event_type : type[Event]) -> int:
+        return self.__tags.count(self.__codec.tag_of(event_type))
+
+
+class IAsyncEventStore(abc.ABC):
+    @abc.abstractmethod
+    async def save_events(self, aggregate_id : Guid, events : Sequence[Event], expected_version : int) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_events_for_aggregate(self, aggregate_id : Guid, from_version : int = 0, to_version : int | None = None) -> Sequence[Event] | None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def read_all(self, from_position : int = 0, batch_size : int = 500) -> AsyncIterator[EventDescriptor]:
+        raise NotImplementedError
+
+
+class AsyncEventStore(IAsyncEventStore):
+    """Runs a blocking ``IEventStore`` on an executor so durable I/O never stalls the event loop."""
+
+    def __init__(self, store : IEventStore, executor : Executor | None = None) -> None:
+        self.__store = store
+        self.__executor = executor
+
+    async def save_events(self, aggregate_id: Guid, events: Sequence[Event], expected_version: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.__executor, self.__store.save_events, aggregate_id, events, expected_version)
+
+    async def get_events_for_aggregate(self, aggregate_id: Guid, from_version: int = 0, to_version: int | None = None) -> Sequence[Event] | None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, self.__store.get_events_for_aggregate, aggregate_id, from_version, to_version)
+
+    async def read_all(self, from_position: int = 0, batch_size: int = 500) -> AsyncIterator[EventDescriptor]:
+        loop = asyncio.get_running_loop()
+        descriptors = self.__store.read_all(from_position, batch_size)
+        while True:
+            batch = await loop.run_in_executor(self.__executor, lambda: list(islice(descriptors, batch_size)))
+            if not batch:
+                return
+            for descriptor in batch:
+                yield descriptor
@@ -1,89 +1,42 @@
 from .message import Message
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from .guid import Guid, guid
 
 
+# Events are slotted dataclasses with generated equality over every field, ``version`` included. They
+# are not frozen because the event store stamps ``version`` on append, and for the same reason they
+# are not hashable: code that needs a set or map of events keys it by ``id(event)``.
 
-
-
+@dataclass(slots=True)
 class Event(Message):
-    version : int
+    version : int = field(default=-1, kw_only=True)
 
+@dataclass(slots=True)
 class InventoryItemDeactivated(Event):
-    def __init__(self, id : Guid) -> None:
-        self._id = id
-
-    @property
-    def id(self)-> Guid:
-        return self._id
+    id : Guid
 
+@dataclass(slots=True)
 class InventoryItemCreated(Event):
-    def __init__(self, id : Guid, name : str, max_qty : int) -> None:
-        self._id = id
-        self._name = name
-        self._max_qty = max_qty
-
-    @property
-    def id(self)-> Guid:
-        return self._id
-
-    @property
-    def name(self)-> str:
-        return self._name
-
-    @property
-    def max_qty(self)-> int:
-        return self._max_qty
-
+    id : Guid
+    name : str
+    max_qty : int
 
+@dataclass(slots=True)
 class  InventoryItemRenamed(Event):
-    def __init__(self, id : Guid, new_name : str) -> None:
-        self._id = id
-        self._new_name = new_name
-
-    @property
-    def id(self)-> Guid:
-        return self._id
-
-    @property
-    def new_name(self)-> str:
-        return self._new_name
+    id : Guid
+    new_name : str
 
+@dataclass(slots=True)
 class ItemsCheckedInToInventory(Event):
-    def __init__(self, id : Guid, count : int) -> None:
-        self._id = id
-        self._count = count
-
-    @property
-    def id(self)-> Guid:
-        return self._id
-
-    @property
-    def count(self)-> int:
-        return self._count
+    id : Guid
+    count : int
 
+@dataclass(slots=True)
 class ItemsRemovedFromInventory(Event):
-    def __init__(self, id : Guid, count : int) -> None:
-        self._id = id
-        self._count = count
-
-    @property
-    def id(self)-> Guid:
-        return self._id
-
-    @property
-    def count(self)-> int:
-        return self._count
+    id : Guid
+    count : int
 
+@dataclass(slots=True)
 class MaxQtyChanged(Event):
-    def __init__(self, id : Guid, new_max_qty : int) -> None:
-        self._id = id
-        self._new_max_qty = new_max_qty
-
-    @property
-    def id(self)-> Guid:
-        return self._id
-
-    @property
-    def new_max_qty(self)-> int:
-        return self._new_max_qty
\ No newline at end of file
+    id : Guid
+    new_max_qty : int
@@ -1,3 +1,5 @@
+from typing import Any
+
 class GenericError(Exception):
     def __init__(self, message : str = "") -> None:
         self.message = message
@@ -11,4 +13,33 @@ class GenericError(Exception):
 
 class InvalidOperationError(GenericError): ...
 class AggregateNotFoundError(GenericError): ...
-class ConcurrencyError(GenericError): ...
\ No newline at end of file
+class ConcurrencyError(GenericError): ...
+class PublishError(GenericError):
+    """The events were committed, but handing them to the publisher failed; ``results`` holds the
+    outcome of each commit of a batch."""
+    def __init__(self, cause : Exception, results : list[ConcurrencyError | None] | None = None) -> None:
+        super().__init__(f"events were committed but not published: {cause!r}")
+        self.cause = cause
+        self.results = results if results is not None else [None]
+
+class BatchError(GenericError):
+    """Raised by a batch handler after applying what it could; ``failed`` pairs each message it did not
+    apply with its error, in the order the messages were given."""
+    def __init__(self, failed : list[tuple[Any, Exception]]) -> None:
+        super().__init__(f"{len(failed)} messages were not applied: {failed[0][1]!r}")
+        self.failed = failed
+
+class DeliveryError(GenericError):
+    """Some handlers did not apply some events while everything else was delivered; ``failures`` holds a
+    ``DeliveryFailure`` for each handler that missed events."""
+    def __init__(self, failures : list[Any]) -> None:
+        super().__init__("; ".join(f"{len(failure.events)} events not applied by {getattr(failure.handler, '__qualname__', failure.handler)}: {failure.error!r}" for failure in failures))
+        self.failures = failures
+
+class ProjectionError(GenericError):
+    """Projection workers did not apply ``events`` while the rest were projected; ``errors`` holds what
+    each failed batch raised, as text so it can come back from a worker process."""
+    def __init__(self, events : list[Any], errors : list[str]) -> None:
+        super().__init__(f"{len(events)} events were not projected: {errors[0]}")
+        self.events = events
+        self.errors = errors
@@ -1,15 +1,101 @@
 from .events import Event
 from .commands import Command
 from .message import Message
-from typing import TypeVar, Generic, Callable, Type, ParamSpec
+from typing import Any, TypeVar, Generic, Callable, Sequence, Type, ParamSpec
 import abc
-from .exceptions import InvalidOperationError
-from multipledispatch import dispatch
+import time
+from dataclasses import dataclass, replace
+from functools import partial
+from .exceptions import BatchError, DeliveryError, InvalidOperationError
+from .dispatch import dispatch
+from .metrics import default_registry, event_handler_failures, handler_name
 
 M = TypeVar('M', bound=Message)
 E = TypeVar('E', bound=Event)
 C = TypeVar('C', bound=Command)
 
+H = TypeVar('H', bound=Callable[..., Any])
+
+_handler_duration = default_registry.histogram("cqrs_event_handler_duration_seconds", "Time one event handler takes for one event, or for one batch under event=\"batch\".", ("event", "handler"))
+
+@dataclass(frozen=True)
+class DeliveryFailure:
+    """``events`` that ``handler`` did not apply, in publish order.
+
+    Once an event fails, the later events of its aggregate are held back from that handler and listed
+    too, so they can be retried in order. ``redeliver`` hands them to that handler alone again and raises
+    a ``DeliveryError`` with whatever still fails.
+    """
+    handler : Callable[..., Any]
+    events : list[Any]
+    error : Exception
+    redeliver : Callable[[], None]
+
+def delivery_failure(handler : Callable[..., Any], events : list[Any], error : Exception, redeliver : Callable[[], None]) -> DeliveryFailure:
+    name = handler_name(handler)
+    for event in events:
+        event_handler_failures.labels(type(event).__name__, name).inc()
+    return DeliveryFailure(handler, events, error, redeliver)
+
+def attempt_delivery(deliver : Callable[[list[Any]], None], messages : list[Any]) -> list[DeliveryFailure]:
+    """Runs ``deliver`` and returns what it did not apply: the failures of a ``DeliveryError``, or all of
+    ``messages`` for any other error."""
+    try:
+        deliver(messages)
+        return []
+    except DeliveryError as e:
+        return e.failures
+    except Exception as e:
+        return [DeliveryFailure(deliver, messages, e, partial(deliver, messages))]
+
+def redeliver(failure : DeliveryFailure) -> list[DeliveryFailure]:
+    """Retries one failed delivery and returns what still fails."""
+    try:
+        failure.redeliver()
+        return []
+    except DeliveryError as e:
+        return e.failures
+    except Exception as e:
+        return [replace(failure, error=e)]
+
+class RoutingTable(Generic[H]):
+    """Handlers subscribed to a message type also receive its subclasses.
+
+    The handlers of a concrete type, in subscription order, are resolved on its first message and cached
+    with their timers, so a lookup is one dict hit; a new subscription drops the cache. ``event_label``
+    replaces the event type in the timer labels, for handlers that are timed per batch.
+    """
+
+    def __init__(self, event_label : str | None = None) -> None:
+        self.__event_label = event_label
+        self.__subscriptions : list[tuple[type, H]] = []
+        self.__resolved : dict[type, list[tuple[H, Any]]] = {}
+
+    def add(self, typename : type, handler : H) -> None:
+        self.__subscriptions.append((typename, handler))
+        # replaced rather than cleared, so a resolution racing with this one lands in the discarded dict
+        self.__resolved = {}
+
+    def get(self, message_type : type) -> list[tuple[H, Any]]:
+        resolved = self.__resolved
+        routes = resolved.get(message_type)
+        if routes is None:
+            label = self.__event_label or message_type.__name__
+            routes = resolved[message_type] = [(handler, _handler_duration.labels(label, handler_name(handler)))
+                                               for typename, handler in self.__subscriptions if issubclass(message_type, typename)]
+        return routes
+
+    def group(self, messages : Sequence[Message]) -> list[tuple[H, Any, list[Message]]]:
+        """Each handler with its timer and the messages routed to it, kept in their original order."""
+        groups : dict[H, tuple[H, Any, list[Message]]] = {}
+        for message in messages:
+            for handler, timer in self.get(type(message)):
+                group = groups.get(handler)
+                if group is None:
+                    group = groups[handler] = (handler, timer, [])
+                group[2].append(message)
+        return list(groups.values())
+
 class ICommandSender(abc.ABC):
 
     @abc.abstractmethod
@@ -22,26 +108,103 @@ class IEventPublisher(abc.ABC):
     def publish(self, event : E) -> None:
         raise NotImplementedError
 
+    def publish_many(self, events : Sequence[E]) -> None:
+        for event in events:
+            self.publish(event)
+
 class FakeBus(ICommandSender, IEventPublisher):
-    __routes : dict[Type[M], list[Callable[[Message], None]]] = {}
+    __routes : RoutingTable[Callable[[Message], None]]
+
+    def __init__(self) -> None:
+        self.__routes = RoutingTable()
+        self.__batch_routes : RoutingTable[Callable[[Sequence[Message]], None]] = RoutingTable("batch")
 
     def register_handler(self, typename : Type[M], handler : Callable[[M], None]) -> None:
-        handlers = self.__routes.setdefault(typename, [])
+        self.__routes.add(typename, handler)
 
-        handlers.append(handler)
+    def register_batch_handler(self, typename : Type[M], handler : Callable[[Sequence[M]], None]) -> None:
+        """``handler`` receives every event of a ``publish_many`` routed to it in one call."""
+        self.__batch_routes.add(typename, handler)
 
     def send(self, command : C) -> None:
         handlers = self.__routes.get(type(command))
         if handlers:
             if len(handlers) != 1:
                 raise InvalidOperationError("cannot send to more than one handler")
-            handlers[0](command)
+            handlers[0][0](command)
         else:
             raise InvalidOperationError("no handler registered")
 
     def publish(self, event : E) -> None:
-        handlers = self.__routes.get(type(event))
-        if not handlers:
-            return
-        for handler in handlers:
-            handler(event)
+        failures : list[DeliveryFailure] = []
+        for handler, timer in self.__routes.get(type(event)):
+            started = time.perf_counter()
+            try:
+                handler(event)
+            except Exception as e:
+                failures.append(delivery_failure(handler, [event], e, partial(self.__redeliver, self.__deliver_each, handler, timer, [event])))
+            finally:
+                timer.observe(time.perf_counter() - started)
+        for handler, timer in self.__batch_routes.get(type(event)):
+            failure = self.__deliver_batch(handler, timer, [event])
+            if failure is not None:
+                failures.append(failure)
+        if failures:
+            raise DeliveryError(failures)
+
+    def publish_many(self, events : Sequence[E]) -> None:
+        # every handler gets its share of the events even when another handler fails on some of them;
+        # what was not applied is raised at the end, per handler
+        failures : list[DeliveryFailure] = []
+        for handler, timer, batch in self.__routes.group(events):
+            failure = self.__deliver_each(handler, timer, batch)
+            if failure is not None:
+                failures.append(failure)
+        for handler, timer, batch in self.__batch_routes.group(events):
+            failure = self.__deliver_batch(handler, timer, batch)
+            if failure is not None:
+                failures.append(failure)
+        if failures:
+            raise DeliveryError(failures)
+
+    def __deliver_each(self, handler : Callable[[Message], None], timer : Any, events : list[Message]) -> DeliveryFailure | None:
+        failed : list[Message] = []
+        error : Exception | None = None
+        held : set[Any] = set()
+        for event in events:
+            aggregate = getattr(event, "id", None)
+            if aggregate in held:
+                failed.append(event)
+                continue
+            started = time.perf_counter()
+            try:
+                handler(event)
+            except Exception as e:
+                error = error or e
+                held.add(aggregate)
+                failed.append(event)
+            finally:
+                timer.observe(time.perf_counter() - started)
+        if not failed:
+            return None
+        return delivery_failure(handler, failed, error, partial(self.__redeliver, self.__deliver_each, handler, timer, failed))
+
+    def __deliver_batch(self, handler : Callable[[Sequence[Message]], None], timer : Any, events : list[Message]) -> DeliveryFailure | None:
+        started = time.perf_counter()
+        try:
+            handler(events)
+            return None
+        except BatchError as e:
+            failed, error = [message for message, _ in e.failed], e.failed[0][1]
+        except Exception as e:
+            # nothing tells which events the handler applied before it raised, so it gets all of them again
+            failed, error = events, e
+        finally:
+            timer.observe(time.perf_counter() - started)
+        return delivery_failure(handler, failed, error, partial(self.__redeliver, self.__deliver_batch, handler, timer, failed))
+
+    @staticmethod
+    def __redeliver(deliver : Callable[..., DeliveryFailure | None], handler : Callable[..., Any], timer : Any, events : list[Message]) -> None:
+        failure = deliver(handler, timer, events)
+        if failure is not None:
+            raise DeliveryError([failure])
@@ -1,2 +1,2 @@
 class Message:
-    pass
\ No newline at end of file
+    __slots__ = ()
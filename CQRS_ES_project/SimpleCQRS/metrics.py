@@ -0,0 +1,189 @@
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Sequence
+from .exceptions import InvalidOperationError
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+def handler_name(handler : Callable[..., Any]) -> str:
+    return getattr(handler, "__qualname__", None) or type(handler).__qualname__
+
+def _escape(value : str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names : Sequence[str], values : Sequence[str], extra : str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value : float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name : str, help : str, labels : Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._children : dict[tuple[str, ...], Any] = {}
+
+    def labels(self, *values : str) -> Any:
+        # the child of a label set is created once, so hot paths pay a single dict lookup for it
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise InvalidOperationError(f"{self.name} expects labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self, lock : threading.Lock) -> None:
+        self.value = 0.0
+        self.lock = lock
+
+    def inc(self, amount : float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount : float = 1.0) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value : float) -> None:
+        self.value = value
+
+class _ScalarMetric(_Metric):
+
+    def __init__(self, name : str, help : str, labels : Sequence[str] = (), function : Callable[[], float] | None = None) -> None:
+        if function is not None and labels:
+            raise InvalidOperationError("a metric read from a function cannot have labels")
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def _new_child(self) -> _Value:
+        return _Value(self._lock)
+
+    def inc(self, amount : float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> list[str]:
+        if self.function is not None:
+            return [f"{self.name} {_format_value(self.function())}"]
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}" for values, child in list(self._children.items())]
+
+class Counter(_ScalarMetric):
+    kind = "counter"
+
+class Gauge(_ScalarMetric):
+    kind = "gauge"
+
+    def set(self, value : float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount : float = 1.0) -> None:
+        self.labels().dec(amount)
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds : tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value : float) -> None:
+        # unlocked: a thread switch inside the increment can drop a sample, which a latency
+        # distribution tolerates, and skipping the lock more than halves the cost of a hot-path call
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name : str, help : str, labels : Sequence[str] = (), buckets : Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def observe(self, value : float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, values)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text exposition format.
+
+    Asking for a name that is already registered returns the existing metric, so modules can declare
+    their metrics at import time; a function-backed metric takes the latest function.
+    """
+
+    def __init__(self) -> None:
+        self.__metrics : dict[str, _Metric] = {}
+        self.__lock = threading.Lock()
+
+    def __get_or_create(self, kind : type, name : str, factory : Callable[[], _Metric]) -> Any:
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = self.__metrics[name] = factory()
+            elif type(metric) is not kind:
+                raise InvalidOperationError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name : str, help : str, labels : Sequence[str] = (), function : Callable[[], float] | None = None) -> Counter:
+        metric = self.__get_or_create(Counter, name, lambda: Counter(name, help, labels, function))
+        metric.function = function or metric.function
+        return metric
+
+    def gauge(self, name : str, help : str, labels : Sequence[str] = (), function : Callable[[], float] | None = None) -> Gauge:
+        metric = self.__get_or_create(Gauge, name, lambda: Gauge(name, help, labels, function))
+        metric.function = function or metric.function
+        return metric
+
+    def histogram(self, name : str, help : str, labels : Sequence[str] = (), buckets : Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.__get_or_create(Histogram, name, lambda: Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+default_registry = MetricsRegistry()
+
+# series written by more than one module are declared here once
+event_handler_failures = default_registry.counter("cqrs_event_handler_failures_total", "Events an event handler did not apply, held back ones included.", ("event", "handler"))
+projection_lag = default_registry.histogram("cqrs_projection_lag_seconds", "Time from handing an event to a stage until the stage delivers it.", ("stage",))
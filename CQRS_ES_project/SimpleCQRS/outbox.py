@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Sequence
+from .events import Event
+from .fake_bus import DeliveryFailure, IEventPublisher, attempt_delivery, redeliver
+from .guid import Guid
+from .exceptions import DeliveryError, InvalidOperationError
+from .metrics import projection_lag
+
+@dataclass(frozen=True)
+class DeliveryStats:
+    enqueued : int
+    delivered : int
+    retried : int
+    failed : int
+    pending : int
+    parked : int
+
+class OutboxPublisher(IEventPublisher):
+    """Post-commit dispatch: the store hands committed events to a bounded outbox and returns, and a
+    background dispatcher delivers them in commit order to the wrapped publisher, retrying failures.
+    Whatever has queued up meanwhile, up to ``max_batch_size`` events, is delivered with one ``publish_many``.
+
+    When the publisher raises ``DeliveryError`` only the deliveries it lists are retried, so a handler
+    that applied an event never gets it twice; any other error retries the batch. Deliveries failing every
+    attempt become dead letters and park their aggregate: its later events are dead-lettered unpublished,
+    so no read model moves past the missing ones, until ``release`` lets them through again.
+    """
+
+    def __init__(self, publisher : IEventPublisher, max_size : int = 10_000, max_attempts : int = 3, retry_delay : float = 0.01, max_batch_size : int = 500) -> None:
+        self.__publisher = publisher
+        self.__max_size = max_size
+        self.__max_batch_size = max_batch_size
+        self.__max_attempts = max_attempts
+        self.__retry_delay = retry_delay
+        self.__queue : deque[tuple[Event, float]] = deque()
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__enqueued = 0
+        self.__delivered = 0
+        self.__retried = 0
+        self.__failed = 0
+        self.__dead_letters : list[DeliveryFailure] = []
+        self.__parked : set[Any] = set()
+        self.__closed = False
+        self.__dispatcher = threading.Thread(target=self.__run, name="outbox-dispatcher", daemon=True)
+        self.__dispatcher.start()
+
+    def publish(self, event : Event) -> None:
+        self.publish_many((event,))
+
+    def publish_many(self, events : Sequence[Event]) -> None:
+        with self.__condition:
+            now = time.perf_counter()
+            for event in events:
+                # a full outbox blocks the writer instead of growing without bound
+                while len(self.__queue) >= self.__max_size and not self.__closed:
+                    self.__condition.notify_all()
+                    self.__condition.wait()
+                if self.__closed:
+                    raise InvalidOperationError("outbox is closed")
+                self.__queue.append((event, now))
+                self.__enqueued += 1
+            self.__condition.notify_all()
+
+    @property
+    def stats(self) -> DeliveryStats:
+        with self.__condition:
+            return DeliveryStats(self.__enqueued, self.__delivered, self.__retried, self.__failed, len(self.__queue) + self.__in_flight, len(self.__parked))
+
+    @property
+    def dead_letters(self) -> list[DeliveryFailure]:
+        with self.__condition:
+            return list(self.__dead_letters)
+
+    @property
+    def parked(self) -> set[Guid]:
+        with self.__condition:
+            return set(self.__parked)
+
+    def release(self, aggregate_id : Guid) -> None:
+        """Publish the events of a parked aggregate again, once its dead letters were dealt with."""
+        with self.__condition:
+            self.__parked.discard(aggregate_id)
+
+    def flush(self, timeout : float | None = None) -> bool:
+        with self.__condition:
+            return self.__condition.wait_for(lambda: not self.__queue and not self.__in_flight, timeout)
+
+    def close(self, timeout : float | None = None) -> None:
+        self.flush(timeout)
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__dispatcher.join(timeout)
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__queue and not self.__closed:
+                    self.__condition.wait()
+                if not self.__queue:
+                    return
+                batch = [self.__queue.popleft() for _ in range(min(len(self.__queue), self.__max_batch_size))]
+                self.__in_flight = len(batch)
+                self.__condition.notify_all()
+
+            events = [event for event, _ in batch]
+            dead = self.__deliver(events)
+            lag = projection_lag.labels("outbox")
+            now = time.perf_counter()
+            for _, enqueued_at in batch:
+                lag.observe(now - enqueued_at)
+
+            with self.__condition:
+                self.__in_flight = 0
+                failed = len({id(event) for failure in dead for event in failure.events})
+                self.__failed += failed
+                self.__delivered += len(events) - failed
+                self.__dead_letters.extend(dead)
+                self.__condition.notify_all()
+
+    def __deliver(self, events : list[Event]) -> list[DeliveryFailure]:
+        with self.__condition:
+            parked = set(self.__parked)
+        held = [event for event in events if getattr(event, "id", None) in parked]
+        if held:
+            events = [event for event in events if getattr(event, "id", None) not in parked]
+
+        failures = attempt_delivery(self.__publisher.publish_many, events) if events else []
+        for attempt in range(1, self.__max_attempts):
+            if not failures:
+                break
+            with self.__condition:
+                self.__retried += 1
+            time.sleep(self.__retry_delay * attempt)
+            failures = [remaining for failure in failures for remaining in redeliver(failure)]
+
+        if failures:
+            print(repr(DeliveryError(failures)))
+            with self.__condition:
+                self.__parked.update(getattr(event, "id", None) for failure in failures for event in failure.events)
+        if held:
+            failures.append(DeliveryFailure(self.__publisher.publish_many, held, InvalidOperationError("aggregate is parked after a failed delivery"),
+                                            partial(self.__publisher.publish_many, held)))
+        return failures
+
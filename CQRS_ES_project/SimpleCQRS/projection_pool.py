@@ -0,0 +1,120 @@
+import multiprocessing
+import queue
+import threading
+from typing import Any, Callable, Sequence
+from .fake_bus import IEventPublisher, E
+from .exceptions import DeliveryError, InvalidOperationError, ProjectionError
+
+class _Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+def _run_partition(publisher_factory : Callable[[], IEventPublisher], events : Any, condition : Any, pending : Any, failures : Any, failed : Any) -> None:
+    publisher = publisher_factory()
+    while True:
+        batch = events.get()
+        if batch is None:
+            return
+        failure : tuple[list[Any], str] | None = None
+        try:
+            publisher.publish_many(batch)
+        except DeliveryError as e:
+            failure = ([event for delivery in e.failures for event in delivery.events], repr(e))
+        except Exception as e:
+            failure = (batch, repr(e))
+        finally:
+            if failure is not None:
+                print(failure[1])
+                failures.put(failure)
+            with condition:
+                # counted with the pending events it belongs to, so a flush that sees them done takes it
+                if failure is not None:
+                    failed.value += 1
+                pending.value -= len(batch)
+                if not pending.value:
+                    condition.notify_all()
+
+class ProjectionPool(IEventPublisher):
+    """Hands events to a fixed set of partition workers, hashed by aggregate id.
+
+    Every worker owns one queue of up to ``max_pending`` batches and its own publisher from
+    ``publisher_factory``, so the events of one aggregate are projected in publish order while other
+    aggregates are projected in parallel. A full partition blocks ``publish`` until its worker catches up;
+    ``publish_many`` hands each worker its share of the events as one batch.
+
+    With ``use_processes`` the workers are processes: the factory and the events must be picklable and
+    the projections live in the worker processes, so they should write to a store shared with readers.
+
+    Events a worker's publisher did not apply are recorded, and the next ``flush`` or ``close`` raises them
+    as a ``ProjectionError`` once everything else is done, so they can be replayed. A publisher that raises
+    a ``DeliveryError`` reports exactly the events it missed; any other error fails its whole batch.
+    """
+
+    def __init__(self, publisher_factory : Callable[[], IEventPublisher], workers : int = 4, use_processes : bool = False, max_pending : int = 1000) -> None:
+        if use_processes:
+            context = multiprocessing.get_context()
+            self.__condition = context.Condition()
+            self.__pending = context.Value("q", 0, lock=False)
+            self.__failed = context.Value("q", 0, lock=False)
+            self.__failures = context.Queue()
+            self.__queues = [context.Queue(max_pending) for _ in range(workers)]
+            self.__workers = [context.Process(target=_run_partition, args=(publisher_factory, q, self.__condition, self.__pending, self.__failures, self.__failed), name=f"projection-{i}", daemon=True)
+                              for i, q in enumerate(self.__queues)]
+        else:
+            self.__condition = threading.Condition()
+            self.__pending = _Counter()
+            self.__failed = _Counter()
+            self.__failures = queue.Queue()
+            self.__queues = [queue.Queue(max_pending) for _ in range(workers)]
+            self.__workers = [threading.Thread(target=_run_partition, args=(publisher_factory, q, self.__condition, self.__pending, self.__failures, self.__failed), name=f"projection-{i}", daemon=True)
+                              for i, q in enumerate(self.__queues)]
+        self.__closed = False
+        for worker in self.__workers:
+            worker.start()
+
+    def publish(self, event : E) -> None:
+        self.publish_many((event,))
+
+    def publish_many(self, events : Sequence[E]) -> None:
+        if self.__closed:
+            raise InvalidOperationError("projection pool is closed")
+        partitions : dict[int, list[E]] = {}
+        for event in events:
+            partitions.setdefault(hash(event.id) % len(self.__queues), []).append(event)
+        with self.__condition:
+            # counted before queueing so a concurrent flush cannot miss it
+            self.__pending.value += len(events)
+        for partition, batch in partitions.items():
+            self.__queues[partition].put(batch)
+
+    @property
+    def pending(self) -> int:
+        with self.__condition:
+            return self.__pending.value
+
+    def flush(self, timeout : float | None = None) -> bool:
+        """Waits until every event published so far was handled; raises a ``ProjectionError`` with the
+        events that failed since the last flush."""
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: not self.__pending.value, timeout):
+                return False
+            count, self.__failed.value = self.__failed.value, 0
+        # a process worker's record may still be on its way through the queue, so these gets block
+        failures = [self.__failures.get() for _ in range(count)]
+        if failures:
+            raise ProjectionError([event for events, _ in failures for event in events], [error for _, error in failures])
+        return True
+
+    def close(self, timeout : float | None = None) -> None:
+        if self.__closed:
+            return
+        try:
+            self.flush(timeout)
+        finally:
+            self.__closed = True
+            for q in self.__queues:
+                q.put(None)
+            for worker in self.__workers:
+                worker.join(timeout)
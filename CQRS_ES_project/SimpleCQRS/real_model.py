@@ -1,10 +1,10 @@
 import abc
-from typing import Sequence, Callable, ParamSpec, Generic, TypeVar
+from typing import Any, Sequence, Callable, ParamSpec, Generic, TypeVar
 from .guid import Guid
 from dataclasses import dataclass
-from .events import (InventoryItemCreated, InventoryItemRenamed, InventoryItemDeactivated, ItemsCheckedInToInventory, ItemsRemovedFromInventory, MaxQtyChanged)
-from multipledispatch import dispatch
-from .exceptions import InvalidOperationError
+from .events import (Event, InventoryItemCreated, InventoryItemRenamed, InventoryItemDeactivated, ItemsCheckedInToInventory, ItemsRemovedFromInventory, MaxQtyChanged)
+from .dispatch import dispatch
+from .exceptions import BatchError, InvalidOperationError
 from .message import Message
 from pydantic import BaseModel
 
@@ -18,6 +18,12 @@ class Handles(Generic[T], abc.ABC):
     def handle(self, message : T)-> None:
         raise NotImplementedError
 
+class HandlesMany(Generic[T], abc.ABC):
+
+    @abc.abstractmethod
+    def handle_many(self, messages : Sequence[T])-> None:
+        raise NotImplementedError
+
 @dataclass
 class InventoryItemDetailsDto:
     id : Guid
@@ -33,21 +39,42 @@ class InventoryItemListDto:
 
 class FakeDatabase:
     details : dict[Guid, InventoryItemDetailsDto] = {}
-    lst : list[InventoryItemListDto] = []
+    # keyed by id for constant-time updates and deletes; a dict also iterates in insertion order
+    lst : dict[Guid, InventoryItemListDto] = {}
 
     @staticmethod
     def find(filter : Callable[[InventoryItemListDto],bool]= lambda x: True) -> InventoryItemListDto | None:
-        for item in FakeDatabase.lst:
+        for item in FakeDatabase.lst.values():
             if filter(item):
                 return item
         return None
 
     @staticmethod
-    def remove_all(filter : Callable[[InventoryItemListDto],bool]= lambda x: True) -> InventoryItemListDto:
-        item = FakeDatabase.find(filter)
-        while item:
-            FakeDatabase.lst.remove(item)
-            item = FakeDatabase.find(filter)
+    def remove_all(filter : Callable[[InventoryItemListDto],bool]= lambda x: True) -> None:
+        for id in [id for id, item in FakeDatabase.lst.items() if filter(item)]:
+            del FakeDatabase.lst[id]
+
+
+def _apply_many(messages : Sequence[Event], find : Callable[[Event], Any], apply : Callable[[Event, Any], Any]) -> None:
+    # consecutive events of one item reuse the row found for the first of them. An event that fails
+    # holds back the later events of its item, while the rest of the batch is still applied
+    row = None
+    failed : list[tuple[Event, Exception]] = []
+    held : dict[Guid, Exception] = {}
+    for message in messages:
+        error = held.get(message.id)
+        if error is None:
+            if row is None or row.id != message.id:
+                row = find(message)
+            try:
+                row = apply(message, row)
+                continue
+            except Exception as e:
+                error = held[message.id] = e
+                row = None
+        failed.append((message, error))
+    if failed:
+        raise BatchError(failed)
 
 
 class IReadModelFacade(abc.ABC):
@@ -62,64 +89,86 @@ class IReadModelFacade(abc.ABC):
 
 class ReadModelFacade(IReadModelFacade):
     def get_inventory_items(self) -> Sequence[InventoryItemListDto]:
-        return FakeDatabase.lst
+        return list(FakeDatabase.lst.values())
 
     def get_inventory_item_details(self, id: Guid) -> InventoryItemDetailsDto:
         return FakeDatabase.details[id]
 
 
-class InventoryListView(Handles):
+class InventoryListView(Handles, HandlesMany):
+
+    @staticmethod
+    def __find(message : Event) -> InventoryItemListDto | None:
+        return None if isinstance(message, InventoryItemCreated) else FakeDatabase.lst.get(message.id)
+
+    def handle(self, message: Event) -> None:
+        self._apply(message, self.__find(message))
+
+    def handle_many(self, messages: Sequence[Event]) -> None:
+        _apply_many(messages, self.__find, self._apply)
 
     @dispatch(InventoryItemCreated)
-    def handle(self, message: InventoryItemCreated) -> None:
-        FakeDatabase.lst.append(InventoryItemListDto(message.id, message.name))
+    def _apply(self, message: InventoryItemCreated, item: InventoryItemListDto | None) -> InventoryItemListDto:
+        item = FakeDatabase.lst[message.id] = InventoryItemListDto(message.id, message.name)
+        return item
 
     @dispatch(InventoryItemRenamed)
-    def handle(self, message: InventoryItemRenamed) -> None:
-        item = FakeDatabase.find(lambda x : x.id == message.id)
+    def _apply(self, message: InventoryItemRenamed, item: InventoryItemListDto | None) -> InventoryItemListDto | None:
         item.name = message.new_name
+        return item
 
     @dispatch(InventoryItemDeactivated)
-    def handle(self, message: InventoryItemDeactivated) -> None:
-        FakeDatabase.remove_all(lambda x : x.id == message.id)
+    def _apply(self, message: InventoryItemDeactivated, item: InventoryItemListDto | None) -> None:
+        FakeDatabase.lst.pop(message.id, None)
 
-class InventoryItemDetailView(Handles):
+class InventoryItemDetailView(Handles, HandlesMany):
 
-    @dispatch(InventoryItemCreated)
-    def handle(self, message: InventoryItemCreated) -> None:
-        print("InventoryItemDetailView called")
-        FakeDatabase.details[message.id] = InventoryItemDetailsDto(message.id, message.name, message.max_qty, 0, 0)
+    def handle(self, message: Event) -> None:
+        self._apply(message, FakeDatabase.details.get(message.id))
 
-    def __get_details_item(self, id : Guid) -> InventoryItemDetailsDto:
-        d = FakeDatabase.details.get(id)
+    def handle_many(self, messages: Sequence[Event]) -> None:
+        _apply_many(messages, lambda message: FakeDatabase.details.get(message.id), self._apply)
+
+    @staticmethod
+    def __require(d : InventoryItemDetailsDto | None) -> InventoryItemDetailsDto:
         if not d:
             raise InvalidOperationError("did not find the original inventory this shouldnt happen")
         return d
 
+    @dispatch(InventoryItemCreated)
+    def _apply(self, message: InventoryItemCreated, d: InventoryItemDetailsDto | None) -> InventoryItemDetailsDto:
+        print("InventoryItemDetailView called")
+        d = FakeDatabase.details[message.id] = InventoryItemDetailsDto(message.id, message.name, message.max_qty, 0, 0)
+        return d
+
     @dispatch(InventoryItemRenamed)
-    def handle(self, message: InventoryItemRenamed) -> None:
-        d = self.__get_details_item(message.id)
+    def _apply(self, message: InventoryItemRenamed, d: InventoryItemDetailsDto | None) -> InventoryItemDetailsDto:
+        d = self.__require(d)
         d.name = message.new_name
         d.version = message.version
+        return d
 
     @dispatch(ItemsRemovedFromInventory)
-    def handle(self, message: ItemsRemovedFromInventory) -> None:
-        d = self.__get_details_item(message.id)
+    def _apply(self, message: ItemsRemovedFromInventory, d: InventoryItemDetailsDto | None) -> InventoryItemDetailsDto:
+        d = self.__require(d)
         d.current_count -= message.count
         d.version = message.version
+        return d
 
     @dispatch(ItemsCheckedInToInventory)
-    def handle(self, message: ItemsCheckedInToInventory) -> None:
-        d = self.__get_details_item(message.id)
+    def _apply(self, message: ItemsCheckedInToInventory, d: InventoryItemDetailsDto | None) -> InventoryItemDetailsDto:
+        d = self.__require(d)
         d.current_count += message.count
         d.version = message.version
+        return d
 
     @dispatch(InventoryItemDeactivated)
-    def handle(self, message: InventoryItemDeactivated) -> None:
+    def _apply(self, message: InventoryItemDeactivated, d: InventoryItemDetailsDto | None) -> None:
         FakeDatabase.details.pop(message.id)
 
     @dispatch(MaxQtyChanged)
-    def handle(self, message: MaxQtyChanged) -> None:
-        d = self.__get_details_item(message.id)
+    def _apply(self, message: MaxQtyChanged, d: InventoryItemDetailsDto | None) -> InventoryItemDetailsDto:
+        d = self.__require(d)
         d.max_qty = message.new_max_qty
         d.version = message.version
+        return d
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from .command_handlers import AsyncInventoryCommandHandlers
+from .commands import Command
+from .exceptions import GenericError, InvalidOperationError
+from .guid import Guid
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    queue_depth : int
+    mailboxes : int
+    workers : int
+    busy_workers : int
+    utilization : float
+
+class CommandScheduler:
+    """Actor-style mailboxes: commands for one inventory item run one after another in arrival order,
+    while a pool of worker tasks drains the mailboxes of different items concurrently.
+
+    ``start`` binds the scheduler to the running loop and ``submit`` only accepts commands on that loop.
+    Commands still waiting when ``close`` runs, and one interrupted by it, fail with an
+    ``InvalidOperationError`` instead of leaving their callers waiting.
+    """
+
+    def __init__(self, handlers : AsyncInventoryCommandHandlers, workers : int = 8) -> None:
+        self.__handlers = handlers
+        self.__worker_count = workers
+        self.__loop : asyncio.AbstractEventLoop | None = None
+        self.__workers : list[asyncio.Task[None]] = []
+        self.__mailboxes : dict[Guid, deque[tuple[Command, asyncio.Future[None | GenericError]]]] = {}
+        self.__ready : asyncio.Queue[Guid] | None = None
+        self.__queue_depth = 0
+        self.__busy = 0
+        self.__busy_time = 0.0
+        self.__started_at = 0.0
+
+    def start(self) -> None:
+        if self.__loop is not None:
+            raise InvalidOperationError("scheduler is already running")
+        self.__loop = asyncio.get_running_loop()
+        self.__ready = asyncio.Queue()
+        self.__queue_depth = 0
+        self.__busy = 0
+        self.__busy_time = 0.0
+        self.__started_at = time.perf_counter()
+        self.__workers = [self.__loop.create_task(self.__work()) for _ in range(self.__worker_count)]
+
+    async def close(self) -> None:
+        for worker in self.__workers:
+            worker.cancel()
+        await asyncio.gather(*self.__workers, return_exceptions=True)
+        self.__workers = []
+        self.__loop = None
+        # mailboxes no worker had taken yet
+        for mailbox in self.__mailboxes.values():
+            self.__abandon(mailbox)
+        self.__mailboxes.clear()
+
+    async def submit(self, command : Command) -> None | GenericError:
+        if self.__loop is None or self.__loop is not asyncio.get_running_loop():
+            raise InvalidOperationError("scheduler is not running on this loop")
+        future : asyncio.Future[None | GenericError] = self.__loop.create_future()
+        mailbox = self.__mailboxes.get(command.inventory_item_id)
+        if mailbox is None:
+            # only a new mailbox is announced; an existing one is already queued or owned by a worker
+            mailbox = self.__mailboxes[command.inventory_item_id] = deque()
+            self.__ready.put_nowait(command.inventory_item_id)
+        mailbox.append((command, future))
+        self.__queue_depth += 1
+        return await future
+
+    @property
+    def stats(self) -> SchedulerStats:
+        busy_time = self.__busy_time
+        elapsed = (time.perf_counter() - self.__started_at) * self.__worker_count if self.__loop else 0.0
+        return SchedulerStats(self.__queue_depth, len(self.__mailboxes), len(self.__workers), self.__busy, busy_time / elapsed if elapsed else 0.0)
+
+    def __abandon(self, mailbox : deque[tuple[Command, asyncio.Future[None | GenericError]]]) -> None:
+        self.__queue_depth -= len(mailbox)
+        while mailbox:
+            command, future = mailbox.popleft()
+            if not future.done():
+                future.set_exception(InvalidOperationError(f"scheduler closed before {command!r} ran"))
+
+    async def __work(self) -> None:
+        while True:
+            id = await self.__ready.get()
+            mailbox = self.__mailboxes[id]
+            self.__busy += 1
+            started = time.perf_counter()
+            future : asyncio.Future[None | GenericError] | None = None
+            try:
+                while mailbox:
+                    command, future = mailbox.popleft()
+                    self.__queue_depth -= 1
+                    try:
+                        result = await self.__handlers.handle(command)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+            finally:
+                # only cancellation leaves the loop early: the interrupted command and those queued
+                # behind it are failed, so none of their callers waits forever
+                if future is not None and not future.done():
+                    future.set_exception(InvalidOperationError(f"scheduler closed while {command!r} ran"))
+                self.__abandon(mailbox)
+                # nothing can be appended between the emptiness check and this removal without an await
+                del self.__mailboxes[id]
+                self.__busy -= 1
+                self.__busy_time += time.perf_counter() - started
@@ -0,0 +1,265 @@
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Sequence
+from .codec import MessageCodec, default_codec
+from .events import Event, InventoryItemCreated, InventoryItemDeactivated, InventoryItemRenamed
+from .fake_bus import FakeBus, IEventPublisher, E
+from .guid import Guid
+from .real_model import IReadModelFacade, InventoryItemDetailView, InventoryItemDetailsDto, InventoryItemListDto, InventoryListView, ReadModelFacade
+from .exceptions import DeliveryError, InvalidOperationError, ProjectionError
+
+# header: write position, read position, applied position; all are byte counts since the ring was created
+_HEADER = struct.Struct("<QQQ")
+_POSITION = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+_WRAP = 0xFFFFFFFF
+
+class SharedRingBuffer:
+    """Single-producer, single-consumer ring of length-prefixed records in shared memory.
+
+    A record that does not fit before the end of the ring is preceded by a wrap marker and written at
+    the start. A semaphore counts the records, so the consumer sleeps instead of polling; a producer
+    facing a full ring waits for the consumer to make room.
+    """
+
+    def __init__(self, capacity : int = 4 * 1024 * 1024, name : str | None = None, records : Any = None) -> None:
+        self.capacity = capacity
+        self.__memory = SharedMemory(name=name, create=name is None, size=_HEADER.size + capacity)
+        self.__buffer = self.__memory.buf
+        self.__records = records if records is not None else multiprocessing.Semaphore(0)
+        if name is None:
+            _HEADER.pack_into(self.__buffer, 0, 0, 0, 0)
+
+    def attach_args(self) -> tuple[int, str, Any]:
+        """Arguments that open the same ring in a child process."""
+        return self.capacity, self.__memory.name, self.__records
+
+    @property
+    def write_position(self) -> int:
+        return _POSITION.unpack_from(self.__buffer, 0)[0]
+
+    @property
+    def read_position(self) -> int:
+        return _POSITION.unpack_from(self.__buffer, 8)[0]
+
+    @property
+    def applied_position(self) -> int:
+        return _POSITION.unpack_from(self.__buffer, 16)[0]
+
+    @applied_position.setter
+    def applied_position(self, position : int) -> None:
+        _POSITION.pack_into(self.__buffer, 16, position)
+
+    def write(self, payload : bytes) -> int:
+        """Append one record and return the write position after it."""
+        record = _LENGTH.size + len(payload)
+        if record > self.capacity // 2:
+            raise InvalidOperationError(f"a {len(payload)} byte record does not fit a {self.capacity} byte ring")
+        while True:
+            write, read, _ = _HEADER.unpack_from(self.__buffer, 0)
+            offset = write % self.capacity
+            tail = self.capacity - offset
+            needed = record + tail if tail < record else record
+            if self.capacity - (write - read) >= needed:
+                break
+            time.sleep(0.0005)
+        if tail < record:
+            if tail >= _LENGTH.size:
+                _LENGTH.pack_into(self.__buffer, _HEADER.size + offset, _WRAP)
+            write += tail
+            offset = 0
+        start = _HEADER.size + offset
+        _LENGTH.pack_into(self.__buffer, start, len(payload))
+        self.__buffer[start + _LENGTH.size:start + record] = payload
+        # the position is published only after the bytes, and the semaphore orders it for the consumer
+        write += record
+        _POSITION.pack_into(self.__buffer, 0, write)
+        self.__records.release()
+        return write
+
+    def read(self, timeout : float | None = None) -> tuple[bytes, int] | None:
+        """Take the oldest record with the read position after it, or None on timeout."""
+        if not self.__records.acquire(timeout=timeout):
+            return None
+        read = self.read_position
+        offset = read % self.capacity
+        tail = self.capacity - offset
+        if tail < _LENGTH.size or _LENGTH.unpack_from(self.__buffer, _HEADER.size + offset)[0] == _WRAP:
+            read += tail
+            offset = 0
+        start = _HEADER.size + offset
+        (length,) = _LENGTH.unpack_from(self.__buffer, start)
+        payload = bytes(self.__buffer[start + _LENGTH.size:start + _LENGTH.size + length])
+        read += _LENGTH.size + length
+        _POSITION.pack_into(self.__buffer, 8, read)
+        return payload, read
+
+    def close(self) -> None:
+        self.__buffer = None
+        self.__memory.close()
+
+    def unlink(self) -> None:
+        self.__memory.unlink()
+
+def default_projections() -> tuple[IEventPublisher, IReadModelFacade]:
+    """The detail and list views behind a FakeBus, with a facade over what they build."""
+    bus = FakeBus()
+    bus.register_batch_handler(Event, InventoryItemDetailView().handle_many)
+    lst = InventoryListView()
+    for event_type in (InventoryItemCreated, InventoryItemDeactivated, InventoryItemRenamed):
+        bus.register_batch_handler(event_type, lst.handle_many)
+    return bus, ReadModelFacade()
+
+def _serve_queries(connection : Any, facade : IReadModelFacade, ring : SharedRingBuffer) -> None:
+    while True:
+        try:
+            name, args, position = connection.recv()
+        except EOFError:
+            return
+        # a query waits for the events published before it, so a caller reads its own writes
+        while ring.applied_position < position:
+            time.sleep(0.0002)
+        try:
+            result = getattr(facade, name)(*args)
+            if isinstance(result, list):
+                result = list(result)
+        except Exception as e:
+            result = e
+        connection.send(result)
+
+def _run_worker(ring_args : tuple[int, str, Any], projections : Callable[[], tuple[IEventPublisher, IReadModelFacade]], codec : MessageCodec,
+                connection : Any, failures : Any, failed : Any) -> None:
+    capacity, name, records = ring_args
+    ring = SharedRingBuffer(capacity, name, records)
+    publisher, facade = projections()
+    threading.Thread(target=_serve_queries, args=(connection, facade, ring), daemon=True).start()
+    while True:
+        data, position = ring.read()
+        if not data:
+            break
+        events = codec.decode_batch(data)
+        failure : tuple[list[Any], str] | None = None
+        try:
+            publisher.publish_many(events)
+        except DeliveryError as e:
+            failure = ([event for delivery in e.failures for event in delivery.events], repr(e))
+        except Exception as e:
+            failure = (events, repr(e))
+        if failure is not None:
+            print(failure[1])
+            # queued and counted before the batch shows as applied, so a flush that sees it applied takes it
+            failures.put(failure)
+            failed.value += 1
+        ring.applied_position = position
+    ring.applied_position = position
+    ring.close()
+
+class SharedMemoryProjections(IEventPublisher, IReadModelFacade):
+    """Runs the read model in worker processes fed through shared-memory rings, without a broker.
+
+    Events are partitioned by aggregate id, so each worker process owns the projections of its share of
+    the items and applies them on its own core. A batch is encoded once per partition and written to that
+    worker's ring. Queries go to the worker owning the item over a pipe and are answered after the worker
+    has applied everything published before them; the item list is gathered from every worker, in
+    insertion order within a worker.
+
+    Events a worker's projections did not apply are sent back to this process, and the next ``flush`` or
+    ``close`` raises them as a ``ProjectionError``. Queries still see everything else.
+
+    ``projections`` runs in each worker and must be picklable when processes are spawned rather than forked.
+    """
+
+    def __init__(self, workers : int = 4, projections : Callable[[], tuple[IEventPublisher, IReadModelFacade]] = default_projections,
+                 capacity : int = 4 * 1024 * 1024, codec : MessageCodec = default_codec) -> None:
+        self.__codec = codec
+        self.__rings = [SharedRingBuffer(capacity) for _ in range(workers)]
+        self.__ring_locks = [threading.Lock() for _ in range(workers)]
+        self.__connections = []
+        self.__query_locks = [threading.Lock() for _ in range(workers)]
+        self.__failures = multiprocessing.Queue()
+        # failure records each worker has sent, and how many of them flush has taken
+        self.__failed = [multiprocessing.Value("q", 0, lock=False) for _ in range(workers)]
+        self.__taken = 0
+        self.__flush_lock = threading.Lock()
+        self.__processes = []
+        for i, ring in enumerate(self.__rings):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_run_worker, args=(ring.attach_args(), projections, codec, child, self.__failures, self.__failed[i]),
+                                              name=f"projection-{i}", daemon=True)
+            process.start()
+            child.close()
+            self.__connections.append(parent)
+            self.__processes.append(process)
+        self.__closed = False
+
+    def __partition(self, id : Guid) -> int:
+        return hash(id) % len(self.__rings)
+
+    def publish(self, event : E) -> None:
+        self.publish_many((event,))
+
+    def publish_many(self, events : Sequence[E]) -> None:
+        if self.__closed:
+            raise InvalidOperationError("projections are closed")
+        partitions : dict[int, list[E]] = {}
+        for event in events:
+            partitions.setdefault(self.__partition(event.id), []).append(event)
+        for partition, batch in partitions.items():
+            with self.__ring_locks[partition]:
+                self.__rings[partition].write(self.__codec.encode_batch(batch))
+
+    def flush(self, timeout : float | None = None) -> bool:
+        """Waits until every worker applied what was published so far; raises a ``ProjectionError`` with the
+        events that failed since the last flush."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(ring.applied_position < ring.write_position for ring in self.__rings):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.0005)
+        self.__raise_failures()
+        return True
+
+    def __raise_failures(self) -> None:
+        with self.__flush_lock:
+            count = sum(failed.value for failed in self.__failed) - self.__taken
+            self.__taken += count
+            # a record may still be on its way through the queue, so these gets block
+            failures = [self.__failures.get() for _ in range(count)]
+        if failures:
+            raise ProjectionError([event for events, _ in failures for event in events], [error for _, error in failures])
+
+    def __query(self, partition : int, name : str, *args : Any) -> Any:
+        with self.__query_locks[partition]:
+            connection = self.__connections[partition]
+            connection.send((name, args, self.__rings[partition].write_position))
+            result = connection.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_inventory_items(self) -> Sequence[InventoryItemListDto]:
+        return [item for partition in range(len(self.__rings)) for item in self.__query(partition, "get_inventory_items")]
+
+    def get_inventory_item_details(self, id : Guid) -> InventoryItemDetailsDto:
+        return self.__query(self.__partition(id), "get_inventory_item_details", id)
+
+    def close(self, timeout : float | None = None) -> None:
+        if self.__closed:
+            return
+        self.__closed = True
+        for ring, lock in zip(self.__rings, self.__ring_locks):
+            with lock:
+                # an empty record tells the worker to stop
+                ring.write(b"")
+        for process in self.__processes:
+            process.join(timeout)
+        try:
+            self.__raise_failures()
+        finally:
+            for connection, ring in zip(self.__connections, self.__rings):
+                connection.close()
+                ring.close()
+                ring.unlink()
@@ -0,0 +1,33 @@
+import abc
+from dataclasses import dataclass
+from typing import Any
+from .guid import Guid
+
+@dataclass(frozen=True)
+class Snapshot:
+    aggregate_id : Guid
+    version : int
+    state : dict[str, Any]
+
+class ISnapshotStore(abc.ABC):
+
+    @abc.abstractmethod
+    def save_snapshot(self, snapshot : Snapshot) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_latest_snapshot(self, aggregate_id : Guid) -> Snapshot | None:
+        raise NotImplementedError
+
+class InMemorySnapshotStore(ISnapshotStore):
+
+    def __init__(self) -> None:
+        self.__snapshots : dict[Guid, Snapshot] = {}
+
+    def save_snapshot(self, snapshot: Snapshot) -> None:
+        current = self.__snapshots.get(snapshot.aggregate_id)
+        if current is None or current.version < snapshot.version:
+            self.__snapshots[snapshot.aggregate_id] = snapshot
+
+    def get_latest_snapshot(self, aggregate_id: Guid) -> Snapshot | None:
+        return self.__snapshots.get(aggregate_id)
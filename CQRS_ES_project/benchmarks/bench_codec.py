@@ -0,0 +1,61 @@
+"""Binary message codec against JSON: encode and decode time and record size per event.
+
+Run from the project directory: python benchmarks/bench_codec.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.codec import default_codec
+from SimpleCQRS.events import (Event, InventoryItemCreated, InventoryItemDeactivated, InventoryItemRenamed, ItemsCheckedInToInventory, ItemsRemovedFromInventory, MaxQtyChanged)
+from SimpleCQRS.guid import guid
+
+ROUNDS = 20_000
+
+FIELDS = {
+    InventoryItemCreated: ("id", "name", "max_qty"),
+    InventoryItemDeactivated: ("id",),
+    InventoryItemRenamed: ("id", "new_name"),
+    ItemsCheckedInToInventory: ("id", "count"),
+    ItemsRemovedFromInventory: ("id", "count"),
+    MaxQtyChanged: ("id", "new_max_qty"),
+}
+TYPES = {event_type.__name__: event_type for event_type in FIELDS}
+
+def json_encode(event : Event) -> bytes:
+    record = {"type": type(event).__name__, "version": event.version}
+    for name in FIELDS[type(event)]:
+        record[name] = getattr(event, name)
+    return json.dumps(record).encode()
+
+def json_decode(data : bytes) -> Event:
+    record = json.loads(data)
+    event_type = TYPES[record["type"]]
+    event = event_type(*[record[name] for name in FIELDS[event_type]])
+    event.version = record["version"]
+    return event
+
+def per_event(function, items : list) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - started) / (ROUNDS * len(items)) * 1e6
+
+def main() -> None:
+    id = guid()
+    events = [InventoryItemCreated(id, "widget", 5), InventoryItemDeactivated(id), InventoryItemRenamed(id, "gadget"),
+              ItemsCheckedInToInventory(id, 3), ItemsRemovedFromInventory(id, 2), MaxQtyChanged(id, 10)]
+    for version, event in enumerate(events):
+        event.version = version
+    for name, encode, decode in (("json", json_encode, json_decode), ("binary", default_codec.encode, default_codec.decode)):
+        records = [encode(event) for event in events]
+        assert [decode(record) for record in records] == events
+        size = sum(map(len, records)) / len(records)
+        print(f"{name:7} encode {per_event(encode, events):5.2f} us, decode {per_event(decode, records):5.2f} us, {size:5.1f} bytes/event")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Columnar store against the in-memory store at 1M events: memory held, replay speed and counting
+events by type. Filling runs under tracemalloc, so expect it to take a couple of minutes.
+
+Run from the project directory: python benchmarks/bench_columnar.py [events]
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.event_store import ColumnarEventStore, EventStore, IEventStore
+from SimpleCQRS.events import InventoryItemCreated, ItemsCheckedInToInventory, ItemsRemovedFromInventory
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+
+EVENTS = 1_000_000
+COMMIT = 10
+AGGREGATES = 10_000
+
+def fill(store : IEventStore, events : int) -> list[str]:
+    ids = [guid() for _ in range(AGGREGATES)]
+    for id in ids:
+        store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    versions = dict.fromkeys(ids, 0)
+    written = len(ids)
+    while written < events:
+        for id in ids:
+            if written >= events:
+                break
+            commit = [ItemsCheckedInToInventory(id, 2) if n % 2 else ItemsRemovedFromInventory(id, 1) for n in range(min(COMMIT, events - written))]
+            store.save_events(id, commit, versions[id])
+            versions[id] += len(commit)
+            written += len(commit)
+    return ids
+
+def measure(name : str, factory, events : int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    store = factory()
+    ids = fill(store, events)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    replayed = sum(1 for _ in store.read_all())
+    read_all = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for id in ids:
+        for _ in store.iter_events_for_aggregate(id):
+            pass
+    per_stream = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if isinstance(store, ColumnarEventStore):
+        created = store.count_events_of_type(InventoryItemCreated)
+    else:
+        created = sum(1 for descriptor in store.read_all() if isinstance(descriptor.event_data, InventoryItemCreated))
+    count = time.perf_counter() - started
+    assert replayed == events and created == AGGREGATES
+
+    print(f"{name:9} {held / events:6.1f} bytes/event held, "
+          f"read_all {events / read_all:8.0f} events/s, per stream {events / per_stream:8.0f} events/s, "
+          f"count by type {count * 1000:8.2f} ms")
+
+def main() -> None:
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS
+    measure("memory", lambda: EventStore(FakeBus()), events)
+    measure("columnar", lambda: ColumnarEventStore(FakeBus()), events)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Replay cost per event through the dispatch tables against multipledispatch, when it is installed.
+
+Run from the project directory: python benchmarks/bench_dispatch.py
+"""
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.dispatch import dispatch
+from SimpleCQRS.domain import InventoryItem
+from SimpleCQRS.events import (InventoryItemCreated, InventoryItemRenamed, ItemsCheckedInToInventory, ItemsRemovedFromInventory, MaxQtyChanged)
+from SimpleCQRS.guid import guid
+
+def history(count : int) -> list:
+    id = guid()
+    events = [InventoryItemCreated(id, "widget", 5)]
+    for k in range(1, count):
+        events.append([ItemsCheckedInToInventory(id, 1), ItemsRemovedFromInventory(id, 1), InventoryItemRenamed(id, f"n{k % 7}"), MaxQtyChanged(id, 5 + k % 3)][k % 4])
+    for version, event in enumerate(events):
+        event.version = version
+    return events
+
+class TableCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    @dispatch(ItemsCheckedInToInventory)
+    def apply(self, event : ItemsCheckedInToInventory) -> None:
+        self.count += event.count
+
+    @dispatch(ItemsRemovedFromInventory)
+    def apply(self, event : ItemsRemovedFromInventory) -> None:
+        self.count -= event.count
+
+    @dispatch(InventoryItemCreated, InventoryItemRenamed, MaxQtyChanged)
+    def apply(self, event : object) -> None:
+        pass
+
+def timed(apply, events : list) -> float:
+    started = time.perf_counter()
+    for event in events:
+        apply(event)
+    return (time.perf_counter() - started) / len(events) * 1e9
+
+def main() -> None:
+    events = history(200_000)
+    print(f"dispatch table      {timed(TableCounter().apply, events):6.0f} ns/event")
+    try:
+        from multipledispatch import dispatch as md_dispatch
+    except ImportError:
+        print("multipledispatch is not installed, skipping the comparison")
+    else:
+        class MultipleDispatchCounter:
+            def __init__(self) -> None:
+                self.count = 0
+
+            @md_dispatch(ItemsCheckedInToInventory)
+            def apply(self, event):
+                self.count += event.count
+
+            @md_dispatch(ItemsRemovedFromInventory)
+            def apply(self, event):
+                self.count -= event.count
+
+            @md_dispatch(InventoryItemCreated)
+            def apply(self, event):
+                pass
+
+            @md_dispatch(InventoryItemRenamed)
+            def apply(self, event):
+                pass
+
+            @md_dispatch(MaxQtyChanged)
+            def apply(self, event):
+                pass
+        print(f"multipledispatch    {timed(MultipleDispatchCounter().apply, events):6.0f} ns/event")
+
+    started = time.perf_counter()
+    item = InventoryItem()
+    item.loads_from_history(events)
+    print(f"InventoryItem replay {(time.perf_counter() - started) / len(events) * 1e9:5.0f} ns/event")
+
+    # loading many aggregates must not leave garbage for the cyclic collector
+    gc.collect()
+    for _ in range(1000):
+        InventoryItem().loads_from_history(history(10))
+    print(f"cyclic garbage after 1000 loads: {gc.collect()} objects")
+
+if __name__ == "__main__":
+    main()
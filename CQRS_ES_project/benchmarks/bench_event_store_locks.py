@@ -0,0 +1,67 @@
+"""Append throughput of the in-memory event store, one writer per aggregate against writers racing on one.
+
+Run from the project directory: python benchmarks/bench_event_store_locks.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.events import Event, InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import ConcurrencyError
+from SimpleCQRS.fake_bus import IEventPublisher
+from SimpleCQRS.guid import guid
+
+APPENDS = 2000
+
+class SlowPublisher(IEventPublisher):
+    """Stands in for projections that take a moment, which is what the stripe locks are held for."""
+    def publish(self, event : Event) -> None:
+        time.sleep(0.00005)
+
+def run(threads : int, target) -> float:
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+def distinct_aggregates(store : EventStore, threads : int) -> float:
+    def write() -> None:
+        id = guid()
+        store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+        for version in range(APPENDS // threads):
+            store.save_events(id, [ItemsCheckedInToInventory(id, 1)], version)
+    return APPENDS / run(threads, write)
+
+def one_aggregate(store : EventStore, threads : int) -> tuple[float, int]:
+    id = guid()
+    store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    conflicts = []
+
+    def write() -> None:
+        for _ in range(APPENDS // threads):
+            version = store.get_events_for_aggregate(id)[-1].version
+            try:
+                store.save_events(id, [ItemsCheckedInToInventory(id, 1)], version)
+            except ConcurrencyError:
+                conflicts.append(version)
+    elapsed = run(threads, write)
+    versions = [event.version for event in store.get_events_for_aggregate(id)]
+    assert versions == list(range(len(versions))), "versions are not contiguous"
+    return (len(versions) - 1) / elapsed, len(conflicts)
+
+def main() -> None:
+    store = EventStore(SlowPublisher())
+    for threads in (1, 2, 4, 8):
+        rate, conflicts = one_aggregate(store, threads)
+        print(f"{threads} threads: distinct aggregates {distinct_aggregates(store, threads):7.0f} appends/s, "
+              f"one aggregate {rate:7.0f} appends/s with {conflicts} conflicts")
+
+if __name__ == "__main__":
+    main()
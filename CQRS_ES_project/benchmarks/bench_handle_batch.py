@@ -0,0 +1,53 @@
+"""Command throughput of ``handle_batch`` against ``handle`` in a loop over the same commands.
+
+Run from the project directory: python benchmarks/bench_handle_batch.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.command_handlers import InventoryCommandHandlers
+from SimpleCQRS.commands import CheckInItemsToInventory, Command, CreateInventoryItem, RemoveItemsFromInventory
+from SimpleCQRS.domain import InventoryItem, Repository
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+
+ITEMS = 200
+MOVEMENTS = 20
+HISTORY = 200
+
+def setup() -> tuple[InventoryCommandHandlers, list[Command]]:
+    """Items with a long history, then ``MOVEMENTS`` stock movements for each, interleaved across items."""
+    h = InventoryCommandHandlers(Repository(EventStore(FakeBus()), InventoryItem))
+    ids = [guid() for _ in range(ITEMS)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        h.handle_batch([CreateInventoryItem(id, "widget") for id in ids])
+        for version in range(0, HISTORY, 2):
+            h.handle_batch([command for id in ids for command in (CheckInItemsToInventory(id, 1, version), RemoveItemsFromInventory(id, 1, version + 1))])
+    commands = []
+    for k in range(0, MOVEMENTS, 2):
+        for id in ids:
+            commands.append(CheckInItemsToInventory(id, 1, HISTORY + k))
+            commands.append(RemoveItemsFromInventory(id, 1, HISTORY + k + 1))
+    return h, commands
+
+def main() -> None:
+    for name in ("handle", "handle_batch"):
+        h, commands = setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            if name == "handle":
+                results = [h.handle(command) for command in commands]
+            else:
+                results = h.handle_batch(commands)
+            elapsed = time.perf_counter() - started
+        assert not any(results), "every command should be accepted"
+        print(f"{name:12} {len(commands) / elapsed:8.0f} commands/s")
+
+if __name__ == "__main__":
+    main()
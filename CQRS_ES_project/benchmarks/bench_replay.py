@@ -0,0 +1,60 @@
+"""Rebuilding the read model from the event log, event by event against batches of ``publish_many``.
+
+Run from the project directory: python benchmarks/bench_replay.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.events import Event, InventoryItemCreated, ItemsCheckedInToInventory, MaxQtyChanged
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.real_model import FakeDatabase, InventoryItemDetailView, InventoryListView
+
+ITEMS = 20_000
+BATCH_SIZE = 500
+
+def event_log() -> list[Event]:
+    store = EventStore(FakeBus())
+    for _ in range(ITEMS):
+        id = guid()
+        store.save_events(id, [InventoryItemCreated(id, "widget", 100)] + [ItemsCheckedInToInventory(id, 1) for _ in range(8)] + [MaxQtyChanged(id, 50)], -1)
+    return [descriptor.event_data for descriptor in store.read_all()]
+
+def replay(log : list[Event], batched : bool) -> float:
+    FakeDatabase.details.clear()
+    FakeDatabase.lst.clear()
+    bus = FakeBus()
+    detail, lst = InventoryItemDetailView(), InventoryListView()
+    if batched:
+        bus.register_batch_handler(Event, detail.handle_many)
+        bus.register_batch_handler(InventoryItemCreated, lst.handle_many)
+    else:
+        bus.register_handler(Event, detail.handle)
+        bus.register_handler(InventoryItemCreated, lst.handle)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        if batched:
+            for k in range(0, len(log), BATCH_SIZE):
+                bus.publish_many(log[k:k + BATCH_SIZE])
+        else:
+            for event in log:
+                bus.publish(event)
+        elapsed = time.perf_counter() - started
+    assert len(FakeDatabase.lst) == ITEMS
+    assert all(d.current_count == 8 and d.max_qty == 50 for d in FakeDatabase.details.values())
+    return len(log) / elapsed
+
+def main() -> None:
+    log = event_log()
+    for _ in range(2):
+        print(f"event by event     {replay(log, False):9.0f} events/s")
+        print(f"publish_many({BATCH_SIZE}) {replay(log, True):9.0f} events/s")
+
+if __name__ == "__main__":
+    main()
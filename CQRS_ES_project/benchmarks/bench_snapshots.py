@@ -0,0 +1,45 @@
+"""Time to load one aggregate against the length of its stream, with and without snapshots.
+
+Run from the project directory: python benchmarks/bench_snapshots.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from SimpleCQRS.domain import InventoryItem, Repository
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.snapshots import InMemorySnapshotStore
+
+SNAPSHOT_EVENTS = 100
+
+def build(rep : Repository, length : int) -> InventoryItem:
+    id = guid()
+    item = InventoryItem(id, "widget")
+    rep.save(item, -1)
+    for k in range(1, length):
+        item.change_name(f"widget {k}")
+        rep.save(item, item.version)
+    return item
+
+def load_time(rep : Repository, id, rounds : int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        rep.get_by_id(id)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+def main() -> None:
+    print(f"{'events':>8} {'full replay':>14} {'snapshot':>14}")
+    for length in (10, 100, 1000, 10_000):
+        storage = EventStore(FakeBus())
+        plain = Repository(storage, InventoryItem)
+        snapshotting = Repository(storage, InventoryItem, InMemorySnapshotStore(), SNAPSHOT_EVENTS)
+        item = build(snapshotting, length)
+        rounds = max(10, 20_000 // length)
+        print(f"{length:>8} {load_time(plain, item.id, rounds):11.1f} us {load_time(snapshotting, item.id, rounds):11.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the packages are imported as top-level SimpleCQRS and CQRSGui, as the app itself does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,134 @@
+"""In-memory stand-in for a RabbitMQ broker behind pika's ``BlockingConnection`` interface, covering what
+SimpleCQRS.rabbitmq uses: durable fanout exchanges and queues, publisher confirms, acks, nacks with
+requeue, and dead-lettering through ``x-dead-letter-exchange``."""
+import threading
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Callable
+
+class PreconditionFailed(Exception):
+    """Raised, as the broker does, when a queue is redeclared with other arguments."""
+
+class Broker:
+
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.bindings : dict[str, list[str]] = {}
+        self.queues : dict[str, deque[tuple[bytes, bool]]] = {}
+        self.arguments : dict[str, dict[str, Any]] = {}
+        self.unacked : dict[str, int] = {}
+        self.confirmed = 0
+
+    def messages(self, queue : str) -> list[bytes]:
+        with self.condition:
+            return [body for body, _ in self.queues.get(queue, ())]
+
+    def route(self, exchange : str, routing_key : str, body : bytes, redelivered : bool = False) -> None:
+        with self.condition:
+            for queue in (self.bindings.get(exchange, []) if exchange else [routing_key]):
+                self.queues[queue].append((body, redelivered))
+            self.condition.notify_all()
+
+class Channel:
+
+    def __init__(self, connection : "Connection") -> None:
+        self.connection = connection
+        self.broker = connection.broker
+        self.is_open = True
+        self.confirms = False
+        self.consumer : tuple[str, Callable[..., None]] | None = None
+        self.consuming = False
+        self.unacked : dict[int, tuple[str, bytes]] = {}
+        self.next_tag = 0
+
+    def exchange_declare(self, exchange : str, exchange_type : str, durable : bool) -> None:
+        with self.broker.condition:
+            self.broker.bindings.setdefault(exchange, [])
+
+    def queue_declare(self, queue : str, durable : bool, arguments : dict[str, Any] | None = None) -> None:
+        with self.broker.condition:
+            if queue in self.broker.queues and self.broker.arguments[queue] != (arguments or {}):
+                raise PreconditionFailed(f"inequivalent arguments for queue {queue}")
+            self.broker.queues.setdefault(queue, deque())
+            self.broker.arguments[queue] = arguments or {}
+
+    def queue_bind(self, queue : str, exchange : str) -> None:
+        with self.broker.condition:
+            if queue not in self.broker.bindings[exchange]:
+                self.broker.bindings[exchange].append(queue)
+
+    def confirm_delivery(self) -> None:
+        self.confirms = True
+
+    def basic_qos(self, prefetch_count : int) -> None:
+        pass
+
+    def basic_publish(self, exchange : str, routing_key : str, body : bytes, properties : Any = None) -> None:
+        self.broker.route(exchange, routing_key, body)
+        if self.confirms:
+            with self.broker.condition:
+                self.broker.confirmed += 1
+
+    def basic_consume(self, queue : str, on_message_callback : Callable[..., None]) -> None:
+        self.consumer = (queue, on_message_callback)
+
+    def start_consuming(self) -> None:
+        queue, callback = self.consumer
+        broker = self.broker
+        self.consuming = True
+        while self.consuming:
+            self.connection.run_callbacks()
+            with broker.condition:
+                if not broker.queues[queue]:
+                    broker.condition.wait(0.01)
+                    continue
+                body, redelivered = broker.queues[queue].popleft()
+                broker.unacked[queue] = broker.unacked.get(queue, 0) + 1
+            self.next_tag += 1
+            self.unacked[self.next_tag] = (queue, body)
+            callback(self, SimpleNamespace(delivery_tag=self.next_tag, redelivered=redelivered), SimpleNamespace(), body)
+
+    def stop_consuming(self) -> None:
+        self.consuming = False
+
+    def __settle(self, delivery_tag : int) -> tuple[str, bytes]:
+        queue, body = self.unacked.pop(delivery_tag)
+        with self.broker.condition:
+            self.broker.unacked[queue] -= 1
+        return queue, body
+
+    def basic_ack(self, delivery_tag : int) -> None:
+        self.__settle(delivery_tag)
+
+    def basic_nack(self, delivery_tag : int, requeue : bool = True) -> None:
+        queue, body = self.__settle(delivery_tag)
+        if requeue:
+            with self.broker.condition:
+                self.broker.queues[queue].appendleft((body, True))
+                self.broker.condition.notify_all()
+            return
+        # without a dead-letter exchange a rejected message is gone, as on the broker
+        dead_letter = self.broker.arguments[queue].get("x-dead-letter-exchange")
+        if dead_letter is not None:
+            self.broker.route(dead_letter, queue, body)
+
+class Connection:
+
+    def __init__(self, broker : Broker) -> None:
+        self.broker = broker
+        self.is_open = True
+        self.callbacks : deque[Callable[[], None]] = deque()
+
+    def channel(self) -> Channel:
+        return Channel(self)
+
+    def add_callback_threadsafe(self, callback : Callable[[], None]) -> None:
+        # run by the consuming thread, as pika does
+        self.callbacks.append(callback)
+
+    def run_callbacks(self) -> None:
+        while self.callbacks:
+            self.callbacks.popleft()()
+
+    def close(self) -> None:
+        self.is_open = False
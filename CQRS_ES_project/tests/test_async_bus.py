@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import pytest
+
+from SimpleCQRS.async_bus import AsyncBus
+from SimpleCQRS.events import ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import DeliveryError
+from SimpleCQRS.guid import guid
+from SimpleCQRS.metrics import default_registry, handler_name
+from SimpleCQRS.outbox import OutboxPublisher
+
+@pytest.fixture
+def bus():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    bus = AsyncBus(workers=2)
+    asyncio.run_coroutine_threadsafe(bus.start(), loop).result()
+    yield bus
+    asyncio.run_coroutine_threadsafe(bus.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+def failures(handler):
+    return default_registry.counter("cqrs_event_handler_failures_total", "", ("event", "handler")).labels("ItemsCheckedInToInventory", handler_name(handler)).value
+
+def test_publish_from_another_thread_reports_what_a_handler_missed(bus):
+    x, y = guid(), guid()
+    applied = []
+
+    def handle(event):
+        if event.id == x:
+            raise RuntimeError("projection unavailable")
+        applied.append(event)
+    bus.register_handler(ItemsCheckedInToInventory, handle)
+    before = failures(handle)
+
+    with pytest.raises(DeliveryError) as error:
+        bus.publish_many([ItemsCheckedInToInventory(x, 1), ItemsCheckedInToInventory(y, 2), ItemsCheckedInToInventory(x, 3)])
+    [failure] = error.value.failures
+    assert [event.count for event in failure.events] == [1, 3]
+    assert [event.id for event in applied] == [y]
+    assert failures(handle) == before + 2
+
+def test_outbox_counts_handler_failures_as_failed(bus):
+    counted = []
+
+    def handle(event):
+        counted.append(event.count)
+        raise RuntimeError("projection unavailable")
+    bus.register_handler(ItemsCheckedInToInventory, handle)
+    outbox = OutboxPublisher(bus, max_attempts=2, retry_delay=0)
+    outbox.publish(ItemsCheckedInToInventory(guid(), 3))
+    assert outbox.flush(5)
+    assert (outbox.stats.delivered, outbox.stats.failed, outbox.stats.retried) == (0, 1, 1)
+    assert counted == [3, 3]
+    outbox.close()
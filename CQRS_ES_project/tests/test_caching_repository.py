@@ -0,0 +1,40 @@
+import pytest
+
+from SimpleCQRS.domain import CachingRepository, InventoryItem, Repository
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.exceptions import ConcurrencyError
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+
+def create():
+    storage = EventStore(FakeBus())
+    rep = CachingRepository(Repository(storage, InventoryItem), storage)
+    id = guid()
+    rep.save(InventoryItem(id, "widget"), -1)
+    return rep, id
+
+def test_concurrent_callers_get_their_own_instance():
+    rep, id = create()
+    first = rep.get_by_id(id)
+    second = rep.get_by_id(id)
+    assert first is not second
+    first.check_in(3)
+    rep.save(first, first.version)
+    second.check_in(3)
+    with pytest.raises(ConcurrencyError):
+        rep.save(second, second.version)
+    assert rep.get_by_id(id).available_qty == 3
+
+def test_unsaved_changes_do_not_reach_the_next_caller():
+    rep, id = create()
+    rep.get_by_id(id).check_in(3)
+    item = rep.get_by_id(id)
+    assert item.available_qty == 0 and not item.get_uncommitted_changes()
+
+def test_saved_instance_is_reused():
+    rep, id = create()
+    item = rep.get_by_id(id)
+    item.check_in(1)
+    rep.save(item, item.version)
+    assert rep.get_by_id(id) is item
+    assert rep.stats.hits == 2
@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+
+import pytest
+
+from SimpleCQRS.event_store import ColumnarEventStore
+from SimpleCQRS.events import Event, InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import InvalidOperationError
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import Guid, guid
+
+@dataclass(slots=True)
+class Unregistered(Event):
+    id : Guid
+
+def test_failed_encode_leaves_no_partial_commit():
+    store = ColumnarEventStore(FakeBus())
+    id = guid()
+    with pytest.raises(InvalidOperationError):
+        store.save_events(id, [InventoryItemCreated(id, "widget", 5), Unregistered(id)], -1)
+    assert store.get_events_for_aggregate(id) is None
+
+    store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    with pytest.raises(InvalidOperationError):
+        store.save_events(id, [ItemsCheckedInToInventory(id, 1), Unregistered(id)], 0)
+    store.save_events(id, [ItemsCheckedInToInventory(id, 2)], 0)
+    assert [(d.version, d.position) for d in store.read_all()] == [(0, 1), (1, 2)]
+    assert store.get_events_for_aggregate(id)[1].count == 2
+
+def test_counts_events_by_type():
+    store = ColumnarEventStore(FakeBus())
+    first, second = guid(), guid()
+    store.save_events(first, [InventoryItemCreated(first, "widget", 5), ItemsCheckedInToInventory(first, 1)], -1)
+    store.save_events(second, [InventoryItemCreated(second, "gadget", 5)], -1)
+    store.save_events(first, [ItemsCheckedInToInventory(first, 2), ItemsCheckedInToInventory(first, 3)], 1)
+    with pytest.raises(InvalidOperationError):
+        store.save_events(second, [ItemsCheckedInToInventory(second, 1), Unregistered(second)], 0)
+
+    assert store.count_events_of_type(InventoryItemCreated) == 2
+    assert store.count_events_of_type(ItemsCheckedInToInventory) == 3
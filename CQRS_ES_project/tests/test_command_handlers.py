@@ -0,0 +1,48 @@
+import asyncio
+
+from SimpleCQRS.command_handlers import AsyncInventoryCommandHandlers, InventoryCommandHandlers, RetryPolicy
+from SimpleCQRS.commands import CheckInItemsToInventory, CreateInventoryItem, RenameInventoryItem
+from SimpleCQRS.domain import AsyncRepository, InventoryItem, Repository
+from SimpleCQRS.event_store import AsyncEventStore, EventStore
+from SimpleCQRS.exceptions import AggregateNotFoundError, ConcurrencyError
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+
+def handlers():
+    storage = EventStore(FakeBus())
+    return InventoryCommandHandlers(Repository(storage, InventoryItem)), storage
+
+def kinds(results):
+    return [None if result is None else type(result) for result in results]
+
+def test_rejected_command_gets_its_result_and_the_batch_carries_on():
+    h, storage = handlers()
+    x, y = guid(), guid()
+    results = h.handle_batch([CreateInventoryItem(x, "x"), CreateInventoryItem(y, "y"), RenameInventoryItem(y, "", 0)])
+    assert kinds(results) == [None, None, ValueError]
+    assert len(storage.get_events_for_aggregate(x)) == 1
+    assert len(storage.get_events_for_aggregate(y)) == 1
+
+def test_stale_command_in_a_group_and_missing_aggregate():
+    h, storage = handlers()
+    x, missing = guid(), guid()
+    results = h.handle_batch([CreateInventoryItem(x, "x"), CheckInItemsToInventory(x, 1, 0), CheckInItemsToInventory(missing, 1, 0),
+                              CheckInItemsToInventory(x, 2, 0), CheckInItemsToInventory(x, 3, 1)])
+    assert kinds(results) == [None, None, AggregateNotFoundError, ConcurrencyError, None]
+    assert [event.version for event in storage.get_events_for_aggregate(x)] == [0, 1, 2]
+    assert storage.get_events_for_aggregate(missing) is None
+
+def test_async_handlers_share_the_sync_behaviour():
+    storage = EventStore(FakeBus())
+    h = AsyncInventoryCommandHandlers(AsyncRepository(AsyncEventStore(storage), InventoryItem), RetryPolicy(base_delay=0))
+    x, missing = guid(), guid()
+
+    async def run():
+        results = await h.handle_batch([CreateInventoryItem(x, "x"), RenameInventoryItem(x, "", 0), CheckInItemsToInventory(missing, 1, 0),
+                                        CheckInItemsToInventory(x, 1, 0), CheckInItemsToInventory(x, 1, 0)])
+        # a stale check-in is rebased onto the latest version by the retry policy
+        return results, await h.handle(CheckInItemsToInventory(x, 2, 0))
+    results, retried = asyncio.run(run())
+    assert kinds(results) == [None, ValueError, AggregateNotFoundError, None, ConcurrencyError]
+    assert retried is None
+    assert [event.version for event in storage.get_events_for_aggregate(x)] == [0, 1, 2]
@@ -0,0 +1,48 @@
+import gc
+
+import pytest
+
+from SimpleCQRS.dispatch import dispatch
+from SimpleCQRS.domain import InventoryItem
+from SimpleCQRS.events import Event, InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.guid import guid
+
+class Base(Event):
+    __slots__ = ()
+
+class Derived(Base):
+    __slots__ = ()
+
+class Handler:
+    @dispatch(Base)
+    def handle(self, message : Base) -> str:
+        return "base"
+
+    @dispatch(InventoryItemCreated)
+    def handle(self, message : InventoryItemCreated) -> str:
+        return "created"
+
+def test_dispatches_on_exact_type_and_through_mro():
+    handler = Handler()
+    assert handler.handle(InventoryItemCreated(guid(), "x", 5)) == "created"
+    assert handler.handle(Derived()) == "base"
+    assert handler.handle(Derived()) == "base"
+
+def test_unknown_type_raises():
+    with pytest.raises(NotImplementedError):
+        Handler().handle(ItemsCheckedInToInventory(guid(), 1))
+
+def test_nothing_is_cached_on_the_instance():
+    handler = Handler()
+    handler.handle(Derived())
+    assert "handle" not in vars(handler)
+
+def test_loading_aggregates_leaves_no_cyclic_garbage():
+    gc.collect()
+    for _ in range(100):
+        id = guid()
+        events = [InventoryItemCreated(id, "x", 5), ItemsCheckedInToInventory(id, 1)]
+        for version, event in enumerate(events):
+            event.version = version
+        InventoryItem().loads_from_history(events)
+    assert gc.collect() == 0
@@ -0,0 +1,13 @@
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.events import InventoryItemCreated
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+
+def test_stores_do_not_share_streams_or_positions():
+    first, second = EventStore(FakeBus()), EventStore(FakeBus())
+    x, y = guid(), guid()
+    first.save_events(x, [InventoryItemCreated(x, "x", 5)], -1)
+    second.save_events(y, [InventoryItemCreated(y, "y", 5)], -1)
+    assert [(d.id, d.position) for d in first.read_all()] == [(x, 1)]
+    assert [(d.id, d.position) for d in second.read_all()] == [(y, 1)]
+    assert second.get_events_for_aggregate(x) is None
@@ -0,0 +1,105 @@
+import sys
+import threading
+
+import pytest
+
+from SimpleCQRS.event_store import ColumnarEventStore, EventStore, FileEventStore, GroupCommitEventStore, SqliteEventStore
+from SimpleCQRS.events import InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import ConcurrencyError
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.metrics import SIZE_BUCKETS, default_registry
+
+WRITERS = 8
+ATTEMPTS = 50
+
+STORES = {
+    "memory": lambda path: EventStore(FakeBus()),
+    "file": lambda path: FileEventStore(FakeBus(), str(path), fsync=False),
+    "sqlite": lambda path: SqliteEventStore(FakeBus(), str(path / "events.db"), synchronous="OFF"),
+    "columnar": lambda path: ColumnarEventStore(FakeBus()),
+    "group-commit": lambda path: GroupCommitEventStore(FileEventStore(FakeBus(), str(path), fsync=False)),
+}
+
+def _store_metrics(label):
+    duration = default_registry.histogram("cqrs_event_store_append_duration_seconds", "", ("store",)).labels(label)
+    length = default_registry.histogram("cqrs_event_store_stream_length_events", "", ("store",), SIZE_BUCKETS).labels(label)
+    return sum(duration.counts), list(length.counts)
+
+@pytest.mark.parametrize("kind", STORES)
+def test_appends_are_measured_per_store(kind, tmp_path):
+    store = STORES[kind](tmp_path)
+    appends, lengths = _store_metrics(kind)
+    id = guid()
+    store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    store.save_events(id, [ItemsCheckedInToInventory(id, 1), ItemsCheckedInToInventory(id, 1)], 0)
+    with pytest.raises(ConcurrencyError):
+        store.save_events(id, [ItemsCheckedInToInventory(id, 1)], 0)
+
+    after, after_lengths = _store_metrics(kind)
+    assert after - appends == 2
+    # a stream of one event, then of three
+    grown = [b - a for a, b in zip(lengths, after_lengths)]
+    assert grown[SIZE_BUCKETS.index(1)] == 1 and grown[SIZE_BUCKETS.index(5)] == 1 and sum(grown) == 2
+
+@pytest.mark.parametrize("kind", STORES)
+def test_racing_writers_keep_versions_contiguous(kind, tmp_path):
+    store = STORES[kind](tmp_path)
+    id = guid()
+    store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    appended, conflicts, errors = [], [], []
+
+    def write():
+        for _ in range(ATTEMPTS):
+            # read the current version, then race every other writer to append after it
+            version = list(store.iter_events_for_aggregate(id))[-1].version
+            try:
+                store.save_events(id, [ItemsCheckedInToInventory(id, 1)], version)
+                appended.append(version + 1)
+            except ConcurrencyError:
+                conflicts.append(version)
+            except Exception as e:
+                errors.append(e)
+    writers = [threading.Thread(target=write) for _ in range(WRITERS)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert errors == []
+    assert len(appended) + len(conflicts) == WRITERS * ATTEMPTS
+    versions = [event.version for event in store.iter_events_for_aggregate(id)]
+    assert versions == list(range(len(appended) + 1))
+    assert sorted(appended) == versions[1:]
+    positions = [descriptor.position for descriptor in store.read_all() if descriptor.id == id]
+    assert positions == sorted(set(positions)) and len(positions) == len(versions)
+    if hasattr(store, "close"):
+        store.close()
+
+def test_commits_get_contiguous_positions():
+    store = EventStore(FakeBus())
+    size = 10
+
+    def write():
+        id = guid()
+        store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+        for version in range(0, size * ATTEMPTS, size):
+            store.save_events(id, [ItemsCheckedInToInventory(id, 1) for _ in range(size)], version)
+    writers = [threading.Thread(target=write) for _ in range(WRITERS)]
+    # switch threads often enough that interleaved commits would show up
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    descriptors = list(store.read_all())
+    assert [d.position for d in descriptors] == list(range(1, len(descriptors) + 1))
+    for k, d in enumerate(descriptors):
+        if d.version % size == 1:
+            commit = [(e.id, e.version) for e in descriptors[k:k + size]]
+            assert commit == [(d.id, d.version + n) for n in range(size)]
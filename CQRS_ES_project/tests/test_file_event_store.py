@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from SimpleCQRS.event_store import FileEventStore
+from SimpleCQRS.events import InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+
+def segment_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def test_failed_sync_leaves_no_partial_commit(tmp_path, monkeypatch):
+    store = FileEventStore(FakeBus(), str(tmp_path))
+    id = guid()
+    store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    size = segment_size(tmp_path)
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        store.save_events(id, [ItemsCheckedInToInventory(id, 1), ItemsCheckedInToInventory(id, 2)], 0)
+    assert segment_size(tmp_path) == size
+    monkeypatch.undo()
+
+    store.save_events(id, [ItemsCheckedInToInventory(id, 3)], 0)
+    store.close()
+    reopened = FileEventStore(FakeBus(), str(tmp_path))
+    events = reopened.get_events_for_aggregate(id)
+    assert [event.version for event in events] == [0, 1]
+    assert events[1].count == 3
+    reopened.close()
@@ -0,0 +1,41 @@
+import threading
+
+from SimpleCQRS.event_store import FileEventStore, GroupCommitEventStore
+from SimpleCQRS.events import InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import PublishError
+from SimpleCQRS.fake_bus import IEventPublisher
+from SimpleCQRS.guid import guid
+
+class FailingPublisher(IEventPublisher):
+    def publish(self, event):
+        raise RuntimeError("bus is down")
+
+def test_publish_failure_keeps_commit_results(tmp_path):
+    store = FileEventStore(FailingPublisher(), str(tmp_path), fsync=False)
+    id = guid()
+    try:
+        store.save_events(id, [InventoryItemCreated(id, "widget", 5)], -1)
+    except PublishError:
+        pass
+    group = GroupCommitEventStore(store, max_batch_delay=5.0, max_batch_size=3)
+    other = guid()
+    saves = [(id, [ItemsCheckedInToInventory(id, 1)], 0), (id, [ItemsCheckedInToInventory(id, 2)], 0), (other, [InventoryItemCreated(other, "gadget", 5)], -1)]
+    outcomes = [None] * len(saves)
+
+    def save(k):
+        try:
+            group.save_events(*saves[k])
+        except Exception as e:
+            outcomes[k] = e
+    threads = [threading.Thread(target=save, args=(k,)) for k in range(len(saves))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    group.close()
+
+    assert sorted(type(outcome).__name__ for outcome in outcomes) == ["ConcurrencyError", "PublishError", "PublishError"]
+    assert isinstance(next(o for o in outcomes if isinstance(o, PublishError)).cause, RuntimeError)
+    assert len(store.get_events_for_aggregate(id)) == 2
+    assert len(store.get_events_for_aggregate(other)) == 1
+    store.close()
@@ -0,0 +1,24 @@
+import dataclasses
+
+import pytest
+
+from SimpleCQRS.commands import CheckInItemsToInventory
+from SimpleCQRS.events import ItemsCheckedInToInventory
+from SimpleCQRS.guid import guid
+
+def test_commands_cannot_change_after_construction():
+    command = CheckInItemsToInventory(guid(), 3, 0)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        command.original_version = 1
+    assert hash(command) == hash(CheckInItemsToInventory(command.inventory_item_id, 3, 0))
+
+def test_events_differing_in_version_are_different_events():
+    id = guid()
+    first, second = ItemsCheckedInToInventory(id, 1), ItemsCheckedInToInventory(id, 1)
+    first.version, second.version = 1, 2
+    assert first != second
+    second.version = 1
+    assert first == second
+    # the version is stamped after construction, so events stay out of sets and dict keys
+    with pytest.raises(TypeError):
+        hash(first)
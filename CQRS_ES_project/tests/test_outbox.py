@@ -0,0 +1,67 @@
+from SimpleCQRS.events import ItemsCheckedInToInventory
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.outbox import OutboxPublisher
+
+class Counter:
+    def __init__(self):
+        self.counts = {}
+
+    def handle(self, event):
+        self.counts[event.id] = self.counts.get(event.id, 0) + event.count
+
+class Flaky:
+    def __init__(self, failures, broken=()):
+        self.failures = failures
+        self.broken = set(broken)
+        self.seen = []
+
+    def handle(self, event):
+        if event.id in self.broken or self.failures:
+            self.failures = max(0, self.failures - 1)
+            raise RuntimeError("projection unavailable")
+        self.seen.append(event)
+
+def outbox_for(*handlers):
+    bus = FakeBus()
+    for handler in handlers:
+        bus.register_handler(ItemsCheckedInToInventory, handler.handle)
+    return OutboxPublisher(bus, retry_delay=0)
+
+def test_retry_reaches_only_the_handler_that_failed():
+    counter, flaky = Counter(), Flaky(failures=1)
+    outbox = outbox_for(counter, flaky)
+    id = guid()
+    outbox.publish(ItemsCheckedInToInventory(id, 3))
+    assert outbox.flush(5)
+    assert counter.counts[id] == 3
+    assert len(flaky.seen) == 1
+    stats = outbox.stats
+    assert (stats.delivered, stats.retried, stats.failed) == (1, 1, 0)
+    outbox.close()
+
+def test_failed_aggregate_is_parked_until_released():
+    x, y = guid(), guid()
+    counter, flaky = Counter(), Flaky(failures=0, broken=[x])
+    outbox = outbox_for(counter, flaky)
+    outbox.publish(ItemsCheckedInToInventory(x, 1))
+    assert outbox.flush(5)
+    outbox.publish_many([ItemsCheckedInToInventory(x, 2), ItemsCheckedInToInventory(y, 4)])
+    assert outbox.flush(5)
+
+    # the counter applied the first event of x; nothing of x after the failure reached any handler
+    assert counter.counts == {x: 1, y: 4}
+    assert [event.id for event in flaky.seen] == [y]
+    assert outbox.parked == {x}
+    assert [[event.count for event in failure.events] for failure in outbox.dead_letters] == [[1], [2]]
+    assert outbox.stats.failed == 2
+
+    flaky.broken.clear()
+    for failure in outbox.dead_letters:
+        failure.redeliver()
+    outbox.release(x)
+    outbox.publish(ItemsCheckedInToInventory(x, 5))
+    assert outbox.flush(5)
+    assert counter.counts[x] == 8
+    assert [event.count for event in flaky.seen if event.id == x] == [1, 2, 5]
+    outbox.close()
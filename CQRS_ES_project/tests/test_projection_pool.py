@@ -0,0 +1,71 @@
+import os
+from functools import partial
+
+import pytest
+
+from SimpleCQRS.events import ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import InvalidOperationError, ProjectionError
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.projection_pool import ProjectionPool
+
+def record(path : str, event) -> None:
+    if not event.count:
+        raise ValueError("nothing to check in")
+    with open(path, "a") as f:
+        f.write(f"{event.id} {event.count}\n")
+
+def recording_bus(directory : str) -> FakeBus:
+    """Appends every event it applies to a file of this worker's own, so process workers can be checked
+    from the test; a check-in of zero items fails."""
+    bus = FakeBus()
+    bus.register_handler(ItemsCheckedInToInventory, partial(record, os.path.join(directory, f"{os.getpid()}-{id(bus)}.log")))
+    return bus
+
+def applied(directory) -> dict[str, list[int]]:
+    streams : dict[str, list[int]] = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as f:
+            for line in f:
+                id, count = line.split()
+                streams.setdefault(id, []).append(int(count))
+    return streams
+
+@pytest.fixture(params=[False, True], ids=["threads", "processes"])
+def use_processes(request):
+    return request.param
+
+def test_events_of_an_aggregate_are_projected_in_order(use_processes, tmp_path):
+    pool = ProjectionPool(partial(recording_bus, str(tmp_path)), workers=3, use_processes=use_processes, max_pending=4)
+    items = [guid() for _ in range(8)]
+    for n in range(1, 51):
+        if n % 2:
+            for id in items:
+                pool.publish(ItemsCheckedInToInventory(id, n))
+        else:
+            pool.publish_many([ItemsCheckedInToInventory(id, n) for id in items])
+    assert pool.flush(10)
+    assert pool.pending == 0
+    pool.close(10)
+
+    assert applied(tmp_path) == {id: list(range(1, 51)) for id in items}
+    with pytest.raises(InvalidOperationError):
+        pool.publish(ItemsCheckedInToInventory(items[0], 1))
+
+def test_failed_events_are_raised_from_flush_and_close(use_processes, tmp_path):
+    pool = ProjectionPool(partial(recording_bus, str(tmp_path)), workers=2, use_processes=use_processes)
+    x, y = guid(), guid()
+    pool.publish_many([ItemsCheckedInToInventory(x, 1), ItemsCheckedInToInventory(y, 0), ItemsCheckedInToInventory(x, 2)])
+    with pytest.raises(ProjectionError) as error:
+        pool.flush(10)
+    assert [(event.id, event.count) for event in error.value.events] == [(y, 0)]
+    assert "nothing to check in" in error.value.errors[0]
+    # reported once: the next flush is clean
+    assert pool.flush(10)
+
+    pool.publish(ItemsCheckedInToInventory(x, 0))
+    with pytest.raises(ProjectionError):
+        pool.close(10)
+    assert applied(tmp_path) == {x: [1, 2]}
+    with pytest.raises(InvalidOperationError):
+        pool.publish(ItemsCheckedInToInventory(x, 3))
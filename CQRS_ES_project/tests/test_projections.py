@@ -0,0 +1,41 @@
+import pytest
+
+from SimpleCQRS.events import Event, InventoryItemCreated, InventoryItemRenamed, ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import BatchError, DeliveryError
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.real_model import FakeDatabase, InventoryItemDetailView, InventoryListView
+
+def projections():
+    bus = FakeBus()
+    detail = InventoryItemDetailView()
+    bus.register_batch_handler(Event, detail.handle_many)
+    lst = InventoryListView()
+    for event_type in (InventoryItemCreated, InventoryItemRenamed):
+        bus.register_batch_handler(event_type, lst.handle_many)
+    return bus, detail
+
+def test_failed_event_does_not_stop_the_batch():
+    x, unknown, y = guid(), guid(), guid()
+    _, detail = projections()
+    with pytest.raises(BatchError) as error:
+        detail.handle_many([InventoryItemCreated(x, "x", 5), ItemsCheckedInToInventory(unknown, 1), InventoryItemCreated(y, "y", 5)])
+    assert [message.id for message, _ in error.value.failed] == [unknown]
+    assert x in FakeDatabase.details and y in FakeDatabase.details
+
+def test_later_events_of_a_failed_item_are_held_back_and_redelivered_in_order():
+    x, y = guid(), guid()
+    bus, _ = projections()
+    checked_in = ItemsCheckedInToInventory(x, 3)
+    with pytest.raises(DeliveryError) as error:
+        bus.publish_many([checked_in, InventoryItemCreated(y, "y", 5), ItemsCheckedInToInventory(x, 2)])
+    assert FakeDatabase.details[y].name == "y"
+    [failure] = error.value.failures
+    assert [event.count for event in failure.events] == [3, 2]
+
+    # the item shows up late; redelivery applies only what the detail view missed
+    FakeDatabase.details.pop(y)
+    bus.publish(InventoryItemCreated(x, "x", 5))
+    failure.redeliver()
+    assert FakeDatabase.details[x].current_count == 5
+    assert y not in FakeDatabase.details
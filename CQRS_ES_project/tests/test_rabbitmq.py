@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from fake_broker import Broker, Connection
+from SimpleCQRS.codec import default_codec
+from SimpleCQRS.command_handlers import InventoryCommandHandlers
+from SimpleCQRS.commands import CheckInItemsToInventory, Command, CreateInventoryItem
+from SimpleCQRS.domain import InventoryItem, Repository
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.events import Event, InventoryItemCreated, ItemsCheckedInToInventory
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.outbox import OutboxPublisher
+from SimpleCQRS.rabbitmq import COMMANDS_QUEUE, DEAD_LETTER_SUFFIX, EVENTS_EXCHANGE, RabbitMqBus, command_consumer, projection_consumer
+from SimpleCQRS.real_model import FakeDatabase, InventoryItemDetailView
+
+def wait_until(condition, timeout : float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+@contextmanager
+def running(consumer, broker, queue, exchange : str | None = EVENTS_EXCHANGE):
+    worker = threading.Thread(target=consumer.run)
+    worker.start()
+    # a fanout exchange drops what it has no bound queue for, so publishing waits for the consumer
+    wait_until(lambda: queue in broker.bindings.get(exchange, ()) if exchange else queue in broker.queues)
+    try:
+        yield
+    finally:
+        consumer.stop()
+        worker.join()
+
+@pytest.fixture
+def broker():
+    return Broker()
+
+def test_committed_events_reach_a_projection_in_another_consumer(broker):
+    rabbit = RabbitMqBus(lambda: Connection(broker))
+    outbox = OutboxPublisher(rabbit)
+    handlers = InventoryCommandHandlers(Repository(EventStore(outbox), InventoryItem))
+    read_side = FakeBus()
+    read_side.register_batch_handler(Event, InventoryItemDetailView().handle_many)
+    consumer = projection_consumer(read_side, "read-model", connection_factory=lambda: Connection(broker))
+
+    ids = [guid() for _ in range(20)]
+    with running(consumer, broker, "read-model"):
+        for id in ids:
+            handlers.handle(CreateInventoryItem(id, "widget"))
+            handlers.handle(CheckInItemsToInventory(id, 2, 0))
+        assert outbox.flush(5)
+        wait_until(lambda: all(id in FakeDatabase.details and FakeDatabase.details[id].current_count == 2 for id in ids))
+    outbox.close()
+    rabbit.close()
+
+    # every publish went through the confirm channel, and every delivery was acknowledged
+    assert broker.confirmed >= 1 and outbox.stats.delivered == 2 * len(ids)
+    assert broker.messages("read-model") == [] and broker.unacked["read-model"] == 0
+
+def test_a_failing_handler_is_retried_alone_then_dead_lettered(broker):
+    applied, attempts = [], []
+
+    def flaky(events):
+        attempts.append(len(events))
+        if len(attempts) < 3:
+            raise ValueError("not yet")
+
+    def broken(events):
+        raise ValueError("never")
+
+    read_side = FakeBus()
+    read_side.register_batch_handler(Event, applied.extend)
+    read_side.register_batch_handler(ItemsCheckedInToInventory, flaky)
+    consumer = projection_consumer(read_side, "read-model", connection_factory=lambda: Connection(broker), retry_delay=0)
+    rabbit = RabbitMqBus(lambda: Connection(broker))
+    id = guid()
+    batch = [InventoryItemCreated(id, "widget", 5), ItemsCheckedInToInventory(id, 1)]
+
+    with running(consumer, broker, "read-model"):
+        rabbit.publish_many(batch)
+        wait_until(lambda: broker.unacked.get("read-model") == 0 and len(attempts) == 3)
+        assert applied == batch and attempts == [1, 1, 1]
+        assert broker.messages("read-model" + DEAD_LETTER_SUFFIX) == []
+
+        read_side.register_batch_handler(InventoryItemCreated, broken)
+        rabbit.publish_many(batch)
+        wait_until(lambda: broker.messages("read-model" + DEAD_LETTER_SUFFIX))
+    rabbit.close()
+
+    # the handlers that succeeded got the batch once; the whole batch is kept for replay
+    assert applied == batch + batch
+    assert broker.messages("read-model" + DEAD_LETTER_SUFFIX) == [default_codec.encode_batch(batch)]
+    assert broker.messages("read-model") == [] and broker.unacked["read-model"] == 0
+
+def test_commands_sent_through_the_broker_are_handled(broker):
+    storage = EventStore(FakeBus())
+    sender = FakeBus()
+    sender.register_handler(Command, InventoryCommandHandlers(Repository(storage, InventoryItem)).handle)
+    consumer = command_consumer(sender, connection_factory=lambda: Connection(broker))
+    rabbit = RabbitMqBus(lambda: Connection(broker))
+    id = guid()
+
+    with running(consumer, broker, COMMANDS_QUEUE, exchange=None):
+        # the bus declares the command queue with the consumer's dead-letter arguments, or the broker refuses
+        rabbit.send(CreateInventoryItem(id, "widget"))
+        rabbit.send(CheckInItemsToInventory(id, 4, 0))
+        wait_until(lambda: len(storage.get_events_for_aggregate(id) or ()) == 2)
+    rabbit.close()
+    assert broker.unacked[COMMANDS_QUEUE] == 0
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from SimpleCQRS.commands import CheckInItemsToInventory
+from SimpleCQRS.exceptions import InvalidOperationError
+from SimpleCQRS.guid import guid
+from SimpleCQRS.scheduler import CommandScheduler
+
+class SlowHandlers:
+    """Stands in for the command handlers: records the order commands start in and how many overlap."""
+
+    def __init__(self, release : asyncio.Event | None = None) -> None:
+        self.release = release
+        self.started : list[tuple[str, int]] = []
+        self.running = 0
+        self.overlap = 0
+
+    async def handle(self, command):
+        self.started.append((command.inventory_item_id, command.count))
+        self.running += 1
+        self.overlap = max(self.overlap, self.running)
+        try:
+            if self.release is not None:
+                await self.release.wait()
+            await asyncio.sleep(0)
+        finally:
+            self.running -= 1
+
+def test_commands_for_one_item_run_in_order_and_items_run_concurrently():
+    handlers = SlowHandlers()
+    scheduler = CommandScheduler(handlers, workers=4)
+    items = [guid() for _ in range(4)]
+
+    async def run():
+        scheduler.start()
+        try:
+            await asyncio.gather(*[scheduler.submit(CheckInItemsToInventory(id, n, n)) for n in range(10) for id in items])
+        finally:
+            await scheduler.close()
+    asyncio.run(run())
+
+    for id in items:
+        assert [n for item, n in handlers.started if item == id] == list(range(10))
+    assert handlers.overlap == 4
+    assert scheduler.stats.queue_depth == 0 and scheduler.stats.mailboxes == 0
+
+def test_close_fails_the_commands_it_interrupts_or_never_ran():
+    # one worker: the first item's command blocks it, so its next command and the second item wait
+    scheduler = CommandScheduler(SlowHandlers(asyncio.Event()), workers=1)
+    first, second = guid(), guid()
+
+    async def run():
+        scheduler.start()
+        submitted = [asyncio.ensure_future(scheduler.submit(CheckInItemsToInventory(id, n, n))) for id, n in ((first, 0), (first, 1), (second, 0))]
+        await asyncio.sleep(0.01)
+        await scheduler.close()
+        return await asyncio.wait_for(asyncio.gather(*submitted, return_exceptions=True), 1)
+    results = asyncio.run(run())
+
+    assert [type(result) for result in results] == [InvalidOperationError] * 3
+    assert scheduler.stats.queue_depth == 0 and scheduler.stats.mailboxes == 0
+
+def test_submit_needs_a_running_scheduler():
+    scheduler = CommandScheduler(SlowHandlers())
+
+    async def run():
+        with pytest.raises(InvalidOperationError):
+            await scheduler.submit(CheckInItemsToInventory(guid(), 1, 0))
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import pytest
+
+from SimpleCQRS.events import InventoryItemCreated, InventoryItemRenamed, ItemsCheckedInToInventory
+from SimpleCQRS.exceptions import InvalidOperationError, ProjectionError
+from SimpleCQRS.guid import guid
+from SimpleCQRS.shared_memory import SharedMemoryProjections, SharedRingBuffer
+
+def test_ring_wraps_around_and_ends_with_the_stop_record():
+    ring = SharedRingBuffer(capacity=64)
+    try:
+        payloads = [bytes([n]) * (n % 13 + 1) for n in range(200)]
+        for payload in payloads:
+            position = ring.write(payload)
+            assert ring.read(timeout=1) == (payload, position)
+        # the ring was filled many times over, so records were split at its end and wrapped
+        assert ring.write_position > 10 * ring.capacity
+        assert ring.read(timeout=0.01) is None
+
+        ring.write(b"first")
+        ring.write(b"")
+        assert ring.read(timeout=1)[0] == b"first"
+        assert ring.read(timeout=1) == (b"", ring.write_position)
+    finally:
+        ring.close()
+        ring.unlink()
+
+def test_ring_refuses_records_larger_than_half_its_capacity():
+    ring = SharedRingBuffer(capacity=64)
+    try:
+        with pytest.raises(InvalidOperationError):
+            ring.write(bytes(40))
+    finally:
+        ring.close()
+        ring.unlink()
+
+def test_queries_read_their_own_writes_and_failures_come_back():
+    projections = SharedMemoryProjections(workers=2, capacity=64 * 1024)
+    items = [guid() for _ in range(6)]
+    projections.publish_many([InventoryItemCreated(id, f"item {n}", 10) for n, id in enumerate(items)])
+    projections.publish(ItemsCheckedInToInventory(items[0], 3))
+    # no flush: each query waits for what was published before it
+    assert projections.get_inventory_item_details(items[0]).current_count == 3
+    # workers fork with whatever earlier tests left in the shared FakeDatabase
+    assert set(items) <= {item.id for item in projections.get_inventory_items()}
+
+    missing = guid()
+    projections.publish_many([ItemsCheckedInToInventory(missing, 1), InventoryItemRenamed(items[1], "renamed")])
+    with pytest.raises(ProjectionError) as error:
+        projections.flush(10)
+    assert [event.id for event in error.value.events] == [missing]
+    assert projections.get_inventory_item_details(items[1]).name == "renamed"
+    assert projections.flush(10)
+
+    # close reports what failed since the last flush and still shuts the workers down
+    projections.publish(ItemsCheckedInToInventory(missing, 1))
+    with pytest.raises(ProjectionError):
+        projections.close(10)
+    with pytest.raises(InvalidOperationError):
+        projections.publish(ItemsCheckedInToInventory(items[0], 1))
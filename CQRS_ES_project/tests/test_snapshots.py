@@ -0,0 +1,24 @@
+from SimpleCQRS.domain import InventoryItem, Repository
+from SimpleCQRS.event_store import EventStore
+from SimpleCQRS.fake_bus import FakeBus
+from SimpleCQRS.guid import guid
+from SimpleCQRS.snapshots import InMemorySnapshotStore
+
+def test_snapshots_are_taken_every_n_events_and_not_on_create():
+    snapshots = InMemorySnapshotStore()
+    rep = Repository(EventStore(FakeBus()), InventoryItem, snapshots, snapshot_every=4)
+    id = guid()
+    item = InventoryItem(id, "widget")
+    rep.save(item, -1)
+    assert snapshots.get_latest_snapshot(id) is None
+    taken = []
+    for _ in range(10):
+        item.change_name("x" + item.name)
+        rep.save(item, item.version)
+        snapshot = snapshots.get_latest_snapshot(id)
+        if snapshot is not None and snapshot.version not in taken:
+            taken.append(snapshot.version)
+    # after the 4th and the 8th event
+    assert taken == [3, 7]
+    loaded = rep.get_by_id(id)
+    assert loaded.version == item.version and loaded.name == item.name